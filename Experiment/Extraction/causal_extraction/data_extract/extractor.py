@@ -23,12 +23,12 @@ except Exception:
             raise
 
 from Experiment.Extraction.causal_extraction.config import API_KEY, out_as_json
-import pandas as pd
+from Experiment.Extraction.causal_extraction.utils import fast_json, prompt_parsing
 import os
 
 from datetime import datetime
+import csv
 import json
-import re
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -58,18 +58,22 @@ except Exception as e:
 def initialize_log_file():
     """Creates the log file with headers if it doesn't exist."""
     if not os.path.exists(LOG_FILE):
-        df = pd.DataFrame(columns=["prompt_template", "input", "output_filename", "timestamp"])
-        df.to_csv(LOG_FILE, index=False)
+        with open(LOG_FILE, 'w', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerow(["prompt_template", "input", "output_filename", "timestamp"])
 
 def append_to_log(template, user_input, filename):
     """Appends a new record to the CSV log file."""
-    new_log_entry = pd.DataFrame([{
-        "prompt_template": template,
-        "input": user_input,
-        "output_filename": filename,
-        "timestamp": datetime.now().isoformat()
-    }])
-    new_log_entry.to_csv(LOG_FILE, mode='a', header=False, index=False)
+    with open(LOG_FILE, 'a', newline='', encoding='utf-8') as f:
+        csv.writer(f).writerow([template, user_input, filename, datetime.now().isoformat()])
+
+@st.cache_data(show_spinner=False)
+def load_log_tail(path, mtime, size, n=10):
+    """Returns the last `n` log records. Cached on the file's mtime and size so reruns skip the parse."""
+    # Records span multiple lines (prompt templates), so parse the whole file
+    # rather than seeking to a byte offset that may land inside a quoted field.
+    # pandas is only needed here, so keep it off the app's import path.
+    import pandas as pd
+    return pd.read_csv(path).tail(n)
 
 # --- Streamlit App UI ---
 st.title("📄✨ Gemini JSON Generator")
@@ -111,26 +115,11 @@ if submitted:
     else:
         with st.spinner("🧠 Gemini is thinking..."):
             try:
-                # Dynamically find the placeholder key (e.g., 'name' from '{name}')
-                # placeholder = prompt_template.split('{')[1].split('}')[0]
                 # Safely substitute user input into the template without invoking
                 # Python's str.format on the whole prompt (which errors if the
-                # prompt contains other braces). Strategies used in order:
-                # 1) Replace literal `{}`
-                # 2) Replace `{input}` specifically
-                # 3) Replace the first simple `{word}` placeholder
-                # 4) Fallback: append the input to the end of the prompt
-                if '{}' in prompt_template:
-                    final_prompt = prompt_template.replace('{}', str(user_input))
-                elif '{input}' in prompt_template:
-                    final_prompt = prompt_template.replace('{input}', str(user_input))
-                else:
-                    m = re.search(r"\{([A-Za-z0-9_]+)\}", prompt_template)
-                    if m:
-                        placeholder = m.group(0)
-                        final_prompt = prompt_template.replace(placeholder, str(user_input), 1)
-                    else:
-                        final_prompt = prompt_template + "\n\nInput: " + str(user_input)
+                # prompt contains other braces). The template is split once per
+                # distinct template, so each submit only joins the input in.
+                final_prompt = str(user_input).join(prompt_parsing.compile_template(prompt_template))
 
                 # --- Call Gemini API ---
                 text, response = model.generate(prompt=final_prompt, generation_config=out_as_json, model_name="gemini-2.5-flash", google_search=False)
@@ -138,32 +127,25 @@ if submitted:
                 # Clean the response to extract only the JSON part
                 raw = (response.text or "").strip()
                 # Remove common markdown fences
-                raw = raw.replace("```json", "").replace("```", "").strip()
+                raw = prompt_parsing.strip_fences(raw)
 
                 parsed_json = None
                 # Strategy 1: try to parse the entire cleaned raw
                 try:
-                    parsed_json = json.loads(raw)
+                    parsed_json = fast_json.loads(raw)
                 except Exception:
                     # Strategy 2: extract likely JSON substring ([ ... ] or { ... })
-                    start = raw.find('[')
-                    end = raw.rfind(']')
-                    if start != -1 and end != -1 and end > start:
-                        candidate = raw[start:end+1]
-                    else:
-                        start = raw.find('{')
-                        end = raw.rfind('}')
-                        if start != -1 and end != -1 and end > start:
-                            candidate = raw[start:end+1]
-                        else:
-                            candidate = raw
+                    candidate = prompt_parsing.extract_json_span(raw)
 
                     # Remove simple JS-style comments and trailing commas
-                    candidate_no_comments = re.sub(r'//.*(?=\n)|/\*.*?\*/', '', candidate, flags=re.S)
-                    candidate_no_comments = re.sub(r',\s*([}\]])', r'\1', candidate_no_comments)
+                    candidate_no_comments = candidate
+                    if "//" in candidate_no_comments or "/*" in candidate_no_comments:
+                        candidate_no_comments = prompt_parsing.COMMENT_RE.sub('', candidate_no_comments)
+                    if ',' in candidate_no_comments:
+                        candidate_no_comments = prompt_parsing.TRAILING_COMMA_RE.sub(r'\1', candidate_no_comments)
 
                     try:
-                        parsed_json = json.loads(candidate_no_comments)
+                        parsed_json = fast_json.loads(candidate_no_comments)
                     except Exception:
                         # Raise a JSONDecodeError to be handled by the outer except
                         raise json.JSONDecodeError("Failed to decode JSON after cleaning", candidate_no_comments, 0)
@@ -173,8 +155,9 @@ if submitted:
                 filename = f"response_{timestamp}.json"
                 filepath = os.path.join(OUTPUT_DIR, filename)
 
-                with open(filepath, 'w') as f:
-                    json.dump(parsed_json, f, indent=4)
+                # Compact UTF-8 output; st.json below handles pretty-printing for display
+                with open(filepath, 'wb') as f:
+                    f.write(fast_json.dumps(parsed_json))
                 
                 # --- Log and Show Success ---
                 append_to_log(prompt_template, user_input, filename)
@@ -194,7 +177,7 @@ if submitted:
 st.divider()
 st.subheader("📜 Generation History")
 if os.path.exists(LOG_FILE):
-    log_df = pd.read_csv(LOG_FILE)
-    st.dataframe(log_df.tail(10), use_container_width=True)
+    log_tail = load_log_tail(LOG_FILE, os.path.getmtime(LOG_FILE), os.path.getsize(LOG_FILE))
+    st.dataframe(log_tail, use_container_width=True)
 else:
     st.info("No logs found yet. Generate a response to start logging.")
\ No newline at end of file
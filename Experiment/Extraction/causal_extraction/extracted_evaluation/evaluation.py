@@ -1,8 +1,15 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
-import json
+import atexit
 import os
 import re
+import threading
+import time
+
+from Experiment.Extraction.causal_extraction.utils import fast_json, score_log
+from Experiment.Extraction.causal_extraction.utils.file_listing import list_files_with_ext
+from Experiment.Extraction.causal_extraction.utils.reference_index import build_reference_index
 
 # Get the script's directory to build absolute paths
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -12,9 +19,14 @@ PROJECT_ROOT = os.path.dirname(os.path.dirname(SCRIPT_DIR))  # Go up to Framewor
 BASE_DIR = os.path.join(PROJECT_ROOT, "Causal_extractor", "data_extract", "output")
 REFERENCE_DIR = os.path.join(PROJECT_ROOT, "Causal_extractor", "data_extract")
 
-# --- NEW: Define the score storage path (inside the base directory) ---
-SCORE_FILE_NAME = "validation_scores.json"
+# --- NEW: Define the score storage path (append-only JSONL log inside the base directory, see utils/score_log.py) ---
+SCORE_FILE_NAME = score_log.SCORE_LOG_NAME
 SCORE_FILE_PATH = os.path.join(BASE_DIR, SCORE_FILE_NAME)
+LEGACY_SCORE_FILE_NAME = score_log.LEGACY_SCORE_FILE_NAME
+LEGACY_SCORE_FILE_PATH = os.path.join(BASE_DIR, LEGACY_SCORE_FILE_NAME)
+# Score edits are kept in memory and appended every SCORE_FLUSH_EDITS edits or SCORE_FLUSH_SECONDS
+SCORE_FLUSH_EDITS = 10
+SCORE_FLUSH_SECONDS = 5.0
 
 # Define column names based on your JSON structure (Main Data)
 # V4 schema columns (all fields from JSON)
@@ -46,51 +58,176 @@ DISPLAY_COLUMNS_V3 = {
     "original reference": "Original Reference"
 }
 
+# Accepted JSON keys (in priority order) for each COLUMNS_V3 entry in V3-like dict files
+V3_KEY_CANDIDATES = [
+    ("pattern", "pattern_type"),
+    ("causal type", "sentence_type"),
+    ("causal", "causal_statement", "relationship"),
+    ("note", "notes", "reasoning"),
+    ("Named entity/Object in causal", "named_entity", "object"),
+    ("original reference", "original_reference", "source_text")
+]
+
 # Default to V4 for display references
 REF_COL_NAME = "Source Text"  # V4 uses source_text
+# Hidden column holding the stripped reference text, computed once per file load for highlighting
+REF_STRIPPED_COL = "_ref_stripped"
+
+# Scoring rubric shown in each metric's "Criteria Guide" expander (score store key -> markdown)
+CRITERIA_GUIDES = {
+    "semantic_fidelity": """
+**5 - Excellent:** The causal statement completely and accurately captures the meaning from the source text with no distortion or loss.
+
+**4 - Good:** The causal statement captures the meaning well, but may have minor phrasing differences that don't change the core meaning.
+
+**3 - Moderate:** The causal statement generally captures the meaning, but some nuance is lost or slightly altered.
+
+**2 - Below Average:** The causal statement captures some meaning, but has notable distortions or missing elements.
+
+**1 - Poor:** The causal statement significantly misrepresents or fails to capture the meaning from the source.
+""",
+    "schema_accuracy": """
+**5 - Excellent:** Causal Type, Sentence Type, and Marked Type are all correctly classified.
+
+**4 - Good:** Two out of three types are correctly classified; the third has a minor error.
+
+**3 - Moderate:** One major type (e.g., Causal Type) is incorrect, or two types have minor errors.
+
+**2 - Below Average:** Multiple types are incorrectly classified.
+
+**1 - Poor:** All or nearly all type classifications are incorrect.
+""",
+    "explicit_accuracy": """
+**5 - Excellent:** Explicit Type classification is correct, matching the presence of a clear causal marker (e.g., "because," "therefore").
+
+**4 - Good:** Classification is correct, but the marker choice or reasoning is slightly ambiguous.
+
+**3 - Moderate:** Classification is borderline correct, with room for interpretation (e.g., implicit causality misidentified as explicit).
+
+**2 - Below Average:** Classification is incorrect but understandable given context.
+
+**1 - Poor:** Classification is clearly wrong (e.g., explicit marked as implicit or vice versa).
+""",
+    "structural_integrity": """
+**5 - Excellent:** Subject and Object are correctly identified with appropriate cause-to-effect directionality.
+
+**4 - Good:** Subject and Object are mostly correct; minor boundary or phrasing issues.
+
+**3 - Moderate:** One element (Subject or Object) is incorrect or direction is partially off.
+
+**2 - Below Average:** Significant errors in structure (e.g., roles swapped or incomplete).
+
+**1 - Poor:** Subject/Object are entirely wrong, or cause-effect directionality is reversed.
+"""
+}
+
+# Radio options per scoring matrix ("—" = not scored) and their positions
+SCORE_OPTIONS = ("—", "1", "2", "3", "4", "5")
+SCORE_INDEX = {option: i for i, option in enumerate(SCORE_OPTIONS)}
+
+# Scoring matrices in grid order: (score store key, heading, radio label, widget key prefix)
+SCORE_CRITERIA = (
+    ("semantic_fidelity", "🎯 Semantic Fidelity (SF)", "Rate Semantic Fidelity (1-5):", "semantic"),
+    ("schema_accuracy", "📊 Schema Classification Accuracy (SA)", "Rate Schema Accuracy (1-5):", "schema"),
+    ("explicit_accuracy", "🔍 Explicit Type Accuracy (EA)", "Rate Explicit Type Accuracy (1-5):", "explicit"),
+    ("structural_integrity", "🔗 Structural Integrity (SI)", "Rate Structural Integrity (1-5):", "structural")
+)
 
 # ------------------------------------------------------------------
 # 0. Score & Notes Management Functions
 # ------------------------------------------------------------------
 
 def load_scores():
-    """Loads the validation scores and notes from a JSON file."""
-    if not os.path.exists(SCORE_FILE_PATH):
-        return {}
+    """Loads the validation scores and notes from the JSONL log (cached until the file changes)."""
+    try:
+        score_log.migrate_legacy_scores(SCORE_FILE_PATH, LEGACY_SCORE_FILE_PATH)
+    except Exception as e:
+        st.error(f"Error migrating scores: {e}")
+    return _load_scores_cached(get_scores_file_mtime())
+
+@st.cache_data(show_spinner=False)
+def _load_scores_cached(scores_mtime):
+    """Replays the JSONL log once per file version (keyed on its mtime); last write per row wins."""
     try:
-        with open(SCORE_FILE_PATH, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return score_log.read_score_log(SCORE_FILE_PATH)
     except Exception as e:
         st.error(f"Error loading scores: {e}")
         return {}
 
-def save_scores(scores):
-    """Saves the current validation scores and notes to a JSON file."""
+@st.cache_resource
+def scores_store():
+    """Mutable in-memory scores dict shared across reruns; saves update it in place and append to the log.
+    Call scores_store.clear() if the scores file is edited outside the app."""
+    return load_scores()
+
+def save_scores(lines):
+    """Appends encoded log lines to the JSONL scores file in one write. Returns True on success."""
     try:
-        os.makedirs(os.path.dirname(SCORE_FILE_PATH), exist_ok=True)
-        with open(SCORE_FILE_PATH, 'w', encoding='utf-8') as f:
-            json.dump(scores, f, indent=4, ensure_ascii=False)
+        score_log.append_score_lines(SCORE_FILE_PATH, lines)
         st.toast("✅ Saved successfully!", icon='💾')
+        return True
     except Exception as e:
         st.error(f"Error saving: {e}")
+        return False
+
+def _flush_scores_at_exit(state):
+    """atexit hook: appends log lines still pending when the server stops (no Streamlit calls here)."""
+    with state["lock"]:
+        if state["pending"]:
+            score_log.append_score_lines(SCORE_FILE_PATH, state["pending"])
+            state["pending"].clear()
+
+@st.cache_resource
+def score_write_state():
+    """Pending log lines for scores_store() edits, shared across reruns and sessions."""
+    state = {"pending": [], "version": 0, "last_write": time.monotonic(), "lock": threading.Lock()}
+    atexit.register(_flush_scores_at_exit, state)
+    return state
+
+def flush_scores():
+    """Appends pending score edits to the log in one write."""
+    state = score_write_state()
+    with state["lock"]:
+        if state["pending"] and save_scores(state["pending"]):
+            state["pending"].clear()
+            state["last_write"] = time.monotonic()
+
+def flush_scores_if_due():
+    """Flushes once SCORE_FLUSH_EDITS edits are pending or SCORE_FLUSH_SECONDS have passed since the last write."""
+    state = score_write_state()
+    with state["lock"]:
+        due = bool(state["pending"]) and (
+            len(state["pending"]) >= SCORE_FLUSH_EDITS
+            or time.monotonic() - state["last_write"] >= SCORE_FLUSH_SECONDS)
+    if due:
+        flush_scores()
+
+def record_score(file_name, unique_id, entry):
+    """Stores one row's scores in memory and queues its log line; appended once enough edits or time have accumulated."""
+    state = score_write_state()
+    with state["lock"]:
+        scores_store().setdefault(file_name, {})[unique_id] = entry
+        state["pending"].append(score_log.score_log_line(file_name, {unique_id: entry}))
+        state["version"] += 1
+    flush_scores_if_due()
+
+def get_scores_version():
+    """Cache key for data that includes scores: changes on every in-memory edit and on file writes."""
+    return get_scores_file_mtime(), score_write_state()["version"]
+
+def score_entry_fields(entry):
+    """(SF, SA, EA, SI, notes) of a 4-matrix entry. Legacy entries are upgraded when the old JSON store is migrated."""
+    return (
+        entry.get("semantic_fidelity", ""),
+        entry.get("schema_accuracy", ""),
+        entry.get("explicit_accuracy", ""),
+        entry.get("structural_integrity", ""),
+        entry.get("notes", "")
+    )
 
 def get_score_and_notes(all_scores, file_name, unique_id):
-    """Get scores and notes for a specific row. Handles old format and new 4-matrix format."""
-    file_scores = all_scores.get(file_name, {})
-    entry = file_scores.get(str(unique_id), {})
-    # Handle old format where entry was just a score string
-    if isinstance(entry, str):
-        return {"semantic_fidelity": entry, "schema_accuracy": "", "explicit_accuracy": "", "structural_integrity": ""}, ""
-    # Handle old format with single "score" key
-    if "score" in entry and "semantic_fidelity" not in entry:
-        return {"semantic_fidelity": entry.get("score", ""), "schema_accuracy": "", "explicit_accuracy": "", "structural_integrity": ""}, entry.get("notes", "")
-    # New format: {"semantic_fidelity": "...", "schema_accuracy": "...", "explicit_accuracy": "...", "structural_integrity": "...", "notes": "..."}
-    return {
-        "semantic_fidelity": entry.get("semantic_fidelity", ""),
-        "schema_accuracy": entry.get("schema_accuracy", ""),
-        "explicit_accuracy": entry.get("explicit_accuracy", ""),
-        "structural_integrity": entry.get("structural_integrity", "")
-    }, entry.get("notes", "")
+    """Get (SF, SA, EA, SI, notes) for a specific row."""
+    return score_entry_fields(all_scores.get(file_name, {}).get(str(unique_id), {}))
 
 def get_scores_file_mtime():
     """Get modification time of scores file for cache invalidation."""
@@ -101,21 +238,16 @@ def get_scores_file_mtime():
 # ------------------------------------------------------------------
 # 1. JSON Data Loading (Main Data) - MODIFIED to include scores
 # ------------------------------------------------------------------
-@st.cache_data(hash_funcs={dict: lambda x: json.dumps(x, sort_keys=True)})
-def load_json_data(file_path, selected_file_name, scores_mtime=None):
+@st.cache_data
+def load_json_data(file_path, selected_file_name, scores_version=None):
     """Load JSON data from file, auto-detect V3 or V4 schema, return DataFrame with all columns."""
     if not os.path.exists(file_path):
         st.error(f"File not found at: {file_path}")
         return pd.DataFrame(columns=list(DISPLAY_COLUMNS_V4.values()) + ["Score"]), "v4"
     
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            raw_data = json.load(f)
-        
-        # Helper to safely get a value or empty string
-        def get_val(d, key):
-            v = d.get(key)
-            return v if v is not None else ""
+        with open(file_path, 'rb') as f:
+            raw_data = fast_json.loads(f.read())
 
         # Case A: legacy format - list of lists (V3)
         if isinstance(raw_data, list) and raw_data and isinstance(raw_data[0], list):
@@ -134,26 +266,23 @@ def load_json_data(file_path, selected_file_name, scores_mtime=None):
             is_v4 = any(k in first_item for k in ['pattern_type', 'sentence_type', 'marked_type', 'explicit_type', 'relationship', 'source_text'])
             
             if is_v4:
-                # V4 schema: extract all fields directly from JSON keys
-                rows = []
-                for item in raw_data:
-                    row = [get_val(item, col) for col in COLUMNS_V4]
-                    rows.append(row)
-                df = pd.DataFrame(rows, columns=COLUMNS_V4)
+                # V4 schema: extract all fields directly from JSON keys. Absent keys become "";
+                # nulls are blanked in text columns only so numeric columns keep their dtype
+                df = pd.DataFrame.from_records(raw_data).reindex(columns=COLUMNS_V4, fill_value="")
+                df = df.fillna({col: "" for col in df.columns if df[col].dtype == object})
                 df = df.rename(columns=DISPLAY_COLUMNS_V4)
                 schema_version = "v4"
             else:
-                # V3-like dict format: map to legacy columns
-                rows = []
-                for item in raw_data:
-                    pattern = item.get('pattern', item.get('pattern_type', ''))
-                    causal_type = item.get('causal type', item.get('sentence_type', ''))
-                    causal = item.get('causal', item.get('causal_statement', item.get('relationship', '')))
-                    note = item.get('note', item.get('notes', item.get('reasoning', '')))
-                    named_entity = item.get('Named entity/Object in causal', item.get('named_entity', item.get('object', '')))
-                    original_reference = item.get('original reference', item.get('original_reference', item.get('source_text', '')))
-                    rows.append([pattern, causal_type, causal, note, named_entity, original_reference])
-                df = pd.DataFrame(rows, columns=COLUMNS_V3)
+                # V3-like dict format: map to legacy columns, resolving each column's key once from the first item
+                keys = [
+                    next((k for k in candidates if k in first_item), None)
+                    for candidates in V3_KEY_CANDIDATES
+                ]
+                records = pd.DataFrame.from_records(raw_data)
+                df = pd.DataFrame(
+                    {col: records[k].fillna('') if k else '' for col, k in zip(COLUMNS_V3, keys)},
+                    index=records.index
+                )
                 df = df.rename(columns=DISPLAY_COLUMNS_V3)
                 schema_version = "v3"
 
@@ -165,27 +294,38 @@ def load_json_data(file_path, selected_file_name, scores_mtime=None):
             st.error("Unsupported JSON format: expected list-of-lists or list-of-dicts.")
             return pd.DataFrame(columns=list(DISPLAY_COLUMNS_V4.values()) + ["SF", "SA", "EA", "SI", "Notes"]), "v4"
 
-        # Add Unique_ID and populate Score/Notes from saved data (if any)
-        df.insert(0, 'Unique_ID', df.index)
-        df['SF'] = ""  # Semantic Fidelity
-        df['SA'] = ""  # Schema Accuracy (Causal, Sentence, Marked Type)
-        df['EA'] = ""  # Explicit Accuracy
-        df['SI'] = ""  # Structural Integrity
-        df['Notes'] = ""
-
-        all_scores = load_scores()
-
-        def populate_score_notes(row):
-            scores, notes = get_score_and_notes(all_scores, selected_file_name, row['Unique_ID'])
-            return pd.Series({
-                'SF': scores['semantic_fidelity'], 
-                'SA': scores['schema_accuracy'],
-                'EA': scores['explicit_accuracy'],
-                'SI': scores['structural_integrity'], 
-                'Notes': notes
-            })
-
-        df[['SF', 'SA', 'EA', 'SI', 'Notes']] = df.apply(populate_score_notes, axis=1)
+        # Unique_ID is the row's position in the file, kept as the (range) index rather than a column;
+        # populate Score/Notes from saved data (if any)
+        df.index = pd.RangeIndex(len(df), name='Unique_ID')
+        if REF_COL_NAME in df.columns:
+            df[REF_STRIPPED_COL] = df[REF_COL_NAME].astype(str).str.strip()
+
+        all_scores = scores_store()
+        file_scores = all_scores.get(selected_file_name)
+
+        if not file_scores:
+            # Nothing scored for this file yet: blank columns, no per-row work
+            for col in ('SF', 'SA', 'EA', 'SI', 'Notes'):
+                df[col] = ""
+            return df, schema_version
+
+        # Build each score column as a plain list in one pass, then assign whole columns
+        n = len(df)
+        sf = [""] * n  # Semantic Fidelity
+        sa = [""] * n  # Schema Accuracy (Causal, Sentence, Marked Type)
+        ea = [""] * n  # Explicit Accuracy
+        si = [""] * n  # Structural Integrity
+        notes = [""] * n
+        for i, uid in enumerate(df.index):
+            entry = file_scores.get(str(uid))
+            if entry:
+                sf[i], sa[i], ea[i], si[i], notes[i] = score_entry_fields(entry)
+
+        df['SF'] = sf
+        df['SA'] = sa
+        df['EA'] = ea
+        df['SI'] = si
+        df['Notes'] = notes
 
         return df, schema_version
 
@@ -193,11 +333,27 @@ def load_json_data(file_path, selected_file_name, scores_mtime=None):
         st.error(f"Error reading: {e}")
         return pd.DataFrame(columns=list(DISPLAY_COLUMNS_V4.values()) + ["SF", "SA", "EA", "SI", "Notes"]), "v4"
 
+@st.cache_data(show_spinner=False)
+def apply_filters(file_path, selected_file_name, scores_version, pattern_col, patterns, causal_type_col, causal_types):
+    """Filter the loaded data by the selected values. Cached on the file, scores version and selections."""
+    df, _ = load_json_data(file_path, selected_file_name, scores_version=scores_version)
+    mask = np.ones(len(df), dtype=bool)
+    if pattern_col in df.columns and patterns:
+        mask &= df[pattern_col].isin(patterns).to_numpy()
+    if causal_type_col in df.columns and causal_types:
+        mask &= df[causal_type_col].isin(causal_types).to_numpy()
+    if mask.all():
+        # Default "everything selected" case: no slice needed
+        return df
+    # Keep the Unique_ID index; rows are addressed by position from here on
+    return df.loc[mask]
+
 # ------------------------------------------------------------------
 # 2. CSV Reference Input Loading
 # ------------------------------------------------------------------
 @st.cache_data
-def load_csv_reference(file_path):
+def load_csv_reference(file_path, file_mtime):
+    """Deduplicated 'input' column of the reference CSV. Cached on the file mtime so edits are picked up."""
     if not os.path.exists(file_path):
         return pd.DataFrame(columns=['input'])
     try:
@@ -211,17 +367,100 @@ def load_csv_reference(file_path):
         st.sidebar.error(f"CSV error: {e}")
         return pd.DataFrame(columns=['input'])
 
+@st.cache_data
+def prepare_reference_index(file_path, file_mtime):
+    """Lookup tables for the sidebar selectbox and source matching of one CSV version."""
+    return build_reference_index(load_csv_reference(file_path, file_mtime)['input'].tolist())
+
 # ------------------------------------------------------------------
 # Highlighting
 # ------------------------------------------------------------------
 
-def highlight_references(row, selected_reference_input):
-    style = [''] * len(row)
-    if selected_reference_input and selected_reference_input != 'None':
-        original_reference_text = str(row[REF_COL_NAME]).strip()
-        if original_reference_text == selected_reference_input.strip():
-            style = ['background-color: #ffd700; color: #333333'] * len(row)
-    return style
+def reference_match_mask(df, selected_reference_input):
+    """Boolean array of rows whose reference text equals the selected input, computed in one pass."""
+    if not selected_reference_input or selected_reference_input == 'None' or REF_STRIPPED_COL not in df.columns:
+        return np.zeros(len(df), dtype=bool)
+    return (df[REF_STRIPPED_COL] == selected_reference_input.strip()).to_numpy()
+
+def highlight_references(col, match_mask):
+    return np.where(match_mask, 'background-color: #ffd700; color: #333333', '')
+
+# ------------------------------------------------------------------
+# 3. Scoring Panel
+# ------------------------------------------------------------------
+
+def score_widget_keys(unique_id):
+    """Session-state keys of one row's scoring widgets: score store key -> radio key, plus "notes" and "form"."""
+    keys = {score_key: f"{widget_prefix}_{unique_id}" for score_key, _, _, widget_prefix in SCORE_CRITERIA}
+    keys["notes"] = f"notes_{unique_id}"
+    keys["form"] = f"score_form_{unique_id}"
+    return keys
+
+def save_and_advance(selected_file_name, selected_unique_id, current_idx, n_rows):
+    """on_click for the Save submit button: records the row's scores from widget state and queues the next
+    row, so the click's own rerun already shows it (no second st.rerun pass)."""
+    keys = score_widget_keys(selected_unique_id)
+    entry = {}
+    for score_key, _, _, _ in SCORE_CRITERIA:
+        value = st.session_state.get(keys[score_key], "—")
+        entry[score_key] = value if value != "—" else ""
+    entry["notes"] = st.session_state.get(keys["notes"], "")
+    # Nothing changed since the last save (a missing entry counts as all-empty): skip the write
+    if score_entry_fields(entry) == get_score_and_notes(scores_store(), selected_file_name, selected_unique_id):
+        st.toast(f"No changes for Unique_ID: {selected_unique_id}")
+    else:
+        record_score(selected_file_name, selected_unique_id, entry)
+        st.toast(f"Saved scores for Unique_ID: {selected_unique_id}", icon='💾')
+    
+    # Auto-select next row
+    if current_idx < n_rows - 1:
+        st.session_state.auto_select_index = current_idx + 1
+
+@st.fragment
+def criteria_guides():
+    """Metric headings with their Criteria Guide toggles. Runs as a fragment, so opening a guide
+    reruns only this grid, not the data loading/filtering above it."""
+    # 2x2 Grid for 4 scoring matrices
+    guide_row1_col1, guide_row1_col2 = st.columns(2)
+    guide_row2_col1, guide_row2_col2 = st.columns(2)
+    
+    guide_cells = (guide_row1_col1, guide_row1_col2, guide_row2_col1, guide_row2_col2)
+    for cell, (score_key, heading, _, _) in zip(guide_cells, SCORE_CRITERIA):
+        with cell:
+            st.markdown(f"##### {heading}")
+            # Guide body is only built and sent while its checkbox is ticked
+            if st.checkbox("📖 Criteria Guide", key=f"guide_{score_key}"):
+                st.markdown(CRITERIA_GUIDES[score_key])
+
+def score_form(selected_file_name, selected_unique_id, current_idx, n_rows, current_scores, current_notes):
+    """Radios, notes and Save for one row inside an st.form: changing them triggers no rerun,
+    and Save submits everything in one full-app rerun (already on the next row)."""
+    keys = score_widget_keys(selected_unique_id)
+    with st.form(keys["form"], clear_on_submit=False):
+        # 2x2 Grid for 4 scoring matrices, in SCORE_CRITERIA order (current_scores follows the same order)
+        score_row1_col1, score_row1_col2 = st.columns(2)
+        score_row2_col1, score_row2_col2 = st.columns(2)
+        
+        score_cells = (score_row1_col1, score_row1_col2, score_row2_col1, score_row2_col2)
+        for cell, current_value, (score_key, _, radio_label, _) in zip(score_cells, current_scores, SCORE_CRITERIA):
+            with cell:
+                st.radio(
+                    radio_label,
+                    options=SCORE_OPTIONS,
+                    horizontal=True,
+                    key=keys[score_key],
+                    index=SCORE_INDEX.get(current_value, 0)
+                )
+        
+        # Notes
+        st.text_area("📝 Notes (optional):", value=current_notes, height=80, key=keys["notes"])
+        
+        st.form_submit_button(
+            "💾 Save Score & Notes",
+            type="primary",
+            on_click=save_and_advance,
+            args=(selected_file_name, selected_unique_id, current_idx, n_rows)
+        )
 
 # ------------------------------------------------------------------
 
@@ -230,6 +469,9 @@ st.set_page_config(
     layout="wide"
 )
 
+# Check the time threshold on every rerun, not only when the next edit arrives
+flush_scores_if_due()
+
 st.title("📄 Causal Extractor Data Analyzer (JSON + CSV Reference)")
 st.markdown(f"Main data loaded from: `{BASE_DIR}`")
 
@@ -241,12 +483,11 @@ st.sidebar.header("🔍 CSV Input PolicyTesting")
 csv_files = []
 if os.path.isdir(REFERENCE_DIR):
     try:
-        csv_files = [f for f in os.listdir(REFERENCE_DIR) if f.endswith('.csv')]
+        csv_files = list_files_with_ext(REFERENCE_DIR, '.csv', os.stat(REFERENCE_DIR).st_mtime)
     except OSError as e:
         st.sidebar.error(f"Permission: {e}")
 
 selected_csv_file_name = None
-df_reference_input = pd.DataFrame(columns=['input'])
 
 if csv_files:
     default = csv_files.index("generation_log.csv") if "generation_log.csv" in csv_files else 0
@@ -256,31 +497,38 @@ if csv_files:
         index=default,
     )
     
+    reference_inputs, reference_inputs_lower = (), ()
     if selected_csv_file_name:
         csv_ref_path = os.path.join(REFERENCE_DIR, selected_csv_file_name)
-        df_reference_input = load_csv_reference(csv_ref_path)
-    reference_inputs = df_reference_input['input'].tolist()
+        reference_inputs, reference_inputs_lower = prepare_reference_index(
+            csv_ref_path, os.path.getmtime(csv_ref_path)
+        )
 else:
     st.sidebar.warning("No CSV found.")
-    reference_inputs = []
+    reference_inputs, reference_inputs_lower = (), ()
 
 selected_reference_input = 'None'
 
 if reference_inputs:
-    display_options = ['None'] + reference_inputs
+    display_options = ('None', *reference_inputs)
     selected_reference_input = st.sidebar.selectbox(
         "Match Original Reference:",
         display_options,
         index=0
     )
 
+# Score edits not yet written to disk (flushed in batches, on exit, or here)
+pending_score_edits = len(score_write_state()["pending"])
+if pending_score_edits and st.sidebar.button(f"💾 Flush {pending_score_edits} pending score edit(s) to disk"):
+    flush_scores()
+
 # ----------------------------------------------------
 # JSON Selection
 # ----------------------------------------------------
 
 json_files = []
 if os.path.isdir(BASE_DIR):
-    json_files = [f for f in os.listdir(BASE_DIR) if f.endswith('.json') and f != SCORE_FILE_NAME]
+    json_files = [f for f in list_files_with_ext(BASE_DIR, '.json', os.stat(BASE_DIR).st_mtime) if f != LEGACY_SCORE_FILE_NAME]
 
 selected_file_name = None
 df = pd.DataFrame(columns=list(DISPLAY_COLUMNS_V4.values()) + ["Score", "Notes"])
@@ -291,8 +539,9 @@ if json_files:
     
     if selected_file_name:
         full_path = os.path.join(BASE_DIR, selected_file_name)
-        # Pass scores file mtime to invalidate cache when scores change
-        df, schema_version = load_json_data(full_path, selected_file_name, scores_mtime=get_scores_file_mtime())
+        # Pass the scores version to invalidate cache when scores change
+        scores_version = get_scores_version()
+        df, schema_version = load_json_data(full_path, selected_file_name, scores_version=scores_version)
         st.caption(f"Detected schema: **{schema_version.upper()}**")
 else:
     st.info("No JSON files found.")
@@ -314,42 +563,41 @@ if not df.empty:
 
     with col1:
         if pattern_col in df.columns:
+            pattern_options = df[pattern_col].unique()
             selected_patterns = st.multiselect(
                 f"Filter by {pattern_col}:",
-                df[pattern_col].unique(),
-                default=df[pattern_col].unique()
+                pattern_options,
+                default=pattern_options
             )
         else:
             selected_patterns = []
 
     with col2:
         if causal_type_col in df.columns:
+            causal_type_options = df[causal_type_col].unique()
             selected_causal_types = st.multiselect(
                 f"Filter by {causal_type_col}:",
-                df[causal_type_col].unique(),
-                default=df[causal_type_col].unique()
+                causal_type_options,
+                default=causal_type_options
             )
         else:
             selected_causal_types = []
 
-    # Apply filters only if columns exist
-    df_filtered = df.copy()
-    if pattern_col in df.columns and selected_patterns:
-        df_filtered = df_filtered[df_filtered[pattern_col].isin(selected_patterns)]
-    if causal_type_col in df.columns and selected_causal_types:
-        df_filtered = df_filtered[df_filtered[causal_type_col].isin(selected_causal_types)]
-    df_filtered = df_filtered.reset_index(drop=True)
+    # Apply filters only if columns exist (cached while the file, scores and selections are unchanged)
+    df_filtered = apply_filters(
+        full_path, selected_file_name, scores_version,
+        pattern_col, tuple(selected_patterns),
+        causal_type_col, tuple(selected_causal_types)
+    )
     
     st.subheader(f"Filtered Data ({len(df_filtered)} rows)")
 
     if selected_reference_input != 'None':
-        styled_df = df_filtered.style.apply(
-            lambda row: highlight_references(row, selected_reference_input),
-            axis=1
-        )
-        st.dataframe(styled_df, use_container_width=True)
+        match_mask = reference_match_mask(df_filtered, selected_reference_input)
+        styled_df = df_filtered.style.apply(highlight_references, axis=0, match_mask=match_mask)
+        st.dataframe(styled_df, use_container_width=True, column_config={REF_STRIPPED_COL: None})
     else:
-        st.dataframe(df_filtered, use_container_width=True, hide_index=True)
+        st.dataframe(df_filtered, use_container_width=True, column_config={REF_STRIPPED_COL: None})
 
     st.markdown("---")
 
@@ -361,7 +609,6 @@ if not df.empty:
     # Build detail view columns based on schema
     if schema_version == "v4":
         cols_for_selection = [
-            'Unique_ID',
             DISPLAY_COLUMNS_V4['pattern_type'],
             DISPLAY_COLUMNS_V4['sentence_type'],
             DISPLAY_COLUMNS_V4['marked_type'],
@@ -372,7 +619,6 @@ if not df.empty:
         ]
     else:
         cols_for_selection = [
-            'Unique_ID',
             DISPLAY_COLUMNS_V3['pattern'],
             DISPLAY_COLUMNS_V3['causal type'],
             DISPLAY_COLUMNS_V3['causal'],
@@ -382,8 +628,6 @@ if not df.empty:
     # Filter to only include columns that exist in df
     cols_for_selection = [c for c in cols_for_selection if c in df_filtered.columns]
     
-    df_selection_view = df_filtered[cols_for_selection].copy()
-    df_selection_view.insert(0, 'Select', False)
     
     # Initialize current_selected_index in session state if not present
     if 'current_selected_index' not in st.session_state:
@@ -394,14 +638,20 @@ if not df.empty:
         st.session_state.current_selected_index = st.session_state.auto_select_index
         st.session_state.auto_select_index = None  # Clear the trigger
     
-    # Apply the current selection from session state
+    # Build the Select column from the current selection in session state and put it in
+    # front of the selected columns (no deep copy of the data columns first)
+    select_col = np.zeros(len(df_filtered), dtype=bool)
     if st.session_state.current_selected_index is not None:
         idx = st.session_state.current_selected_index
-        if idx < len(df_selection_view):
-            df_selection_view.loc[idx, 'Select'] = True
+        if idx < len(select_col):
+            select_col[idx] = True
+    df_selection_view = pd.concat(
+        [pd.Series(select_col, index=df_filtered.index, name='Select'), df_filtered[cols_for_selection]],
+        axis=1
+    )
     
     edited_df_view = st.data_editor(
-        df_selection_view.drop(columns=['Unique_ID']), 
+        df_selection_view, 
         use_container_width=True, 
         column_config={
             "Select": st.column_config.CheckboxColumn("Select"),
@@ -413,13 +663,13 @@ if not df.empty:
         key="detail_view_editor"
     )
 
-    edited_df_with_id = pd.merge(
-        edited_df_view.reset_index(names=['original_index']),
-        df_filtered[['Unique_ID']].reset_index(names=['original_index']),
-        on='original_index',
-    )
-    
-    selected_rows = edited_df_with_id[edited_df_with_id['Select'] == True]
+    # The editor rows keep df_filtered's order, so selected positions map
+    # straight back to their Unique_IDs (df_filtered's index)
+    selected_positions = np.flatnonzero((edited_df_view['Select'] == True).to_numpy())
+    selected_rows = pd.DataFrame({
+        'original_index': selected_positions,
+        'Unique_ID': df_filtered.index.to_numpy()[selected_positions],
+    })
     
     # Update session state based on user's manual selection in data_editor
     # Only update if user actually changed the selection (not on initial load)
@@ -452,15 +702,16 @@ if not df.empty:
             selected_unique_id = str(selected_row_data['Unique_ID'])
             
             # Get current scores and notes
-            all_scores = load_scores()
-            current_scores, current_notes = get_score_and_notes(all_scores, selected_file_name, selected_unique_id)
+            all_scores = scores_store()
+            current_sf, current_sa, current_ea, current_si, current_notes = get_score_and_notes(
+                all_scores, selected_file_name, selected_unique_id
+            )
 
             # ---------------------------
             # PolicyTesting Display
             # ---------------------------
-            # Get the full row data from df_filtered using Unique_ID
-            unique_id = selected_row_data['Unique_ID']
-            full_row = df_filtered[df_filtered['Unique_ID'] == unique_id].iloc[0]
+            # Get the full row data from df_filtered (original_index is the row's position in it)
+            full_row = df_filtered.iloc[selected_row_data['original_index']]
             
             if schema_version == "v4":
                 causal_statement = full_row.get(DISPLAY_COLUMNS_V4['relationship'], '')
@@ -512,13 +763,14 @@ if not df.empty:
                 
                 st.subheader("📝 Selected Item Details")
                 
-                # Full Relationship at the top with bigger text
-                st.markdown("##### 🔗 Full Relationship")
-                st.markdown(f"<p style='font-size:20px; line-height:1.6;'><em>{causal_statement}</em></p>", unsafe_allow_html=True)
-                
-                # Display subject and object with bigger text
-                st.markdown(f"<p style='font-size:18px;'><strong>{DISPLAY_COLUMNS_V4['subject']}:</strong> <span style='color:#28a745; font-size:20px;'>{subject or '—'}</span></p>", unsafe_allow_html=True)
-                st.markdown(f"<p style='font-size:18px;'><strong>{DISPLAY_COLUMNS_V4['object']}:</strong> <span style='color:#dc3545; font-size:20px;'>{obj or '—'}</span></p>", unsafe_allow_html=True)
+                # Full Relationship (bigger text) and subject/object in one markdown call
+                html_parts = [
+                    "##### 🔗 Full Relationship",
+                    f"<p style='font-size:20px; line-height:1.6;'><em>{causal_statement}</em></p>",
+                    f"<p style='font-size:18px;'><strong>{DISPLAY_COLUMNS_V4['subject']}:</strong> <span style='color:#28a745; font-size:20px;'>{subject or '—'}</span></p>",
+                    f"<p style='font-size:18px;'><strong>{DISPLAY_COLUMNS_V4['object']}:</strong> <span style='color:#dc3545; font-size:20px;'>{obj or '—'}</span></p>",
+                ]
+                st.markdown("\n\n".join(html_parts), unsafe_allow_html=True)
                 
                 # Display all types in a clear grid layout
                 st.markdown("##### 📋 Classification Types")
@@ -543,15 +795,16 @@ if not df.empty:
                     st.caption(reasoning)
                 
                 # Show saved scores summary
-                saved_scores_display = f"SF: `{current_scores['semantic_fidelity'] or '-'}` | SA: `{current_scores['schema_accuracy'] or '-'}` | EA: `{current_scores['explicit_accuracy'] or '-'}` | SI: `{current_scores['structural_integrity'] or '-'}`"
-                st.markdown(f"**Saved Scores:** {saved_scores_display}")
+                saved_scores_display = f"SF: `{current_sf or '-'}` | SA: `{current_sa or '-'}` | EA: `{current_ea or '-'}` | SI: `{current_si or '-'}`"
+                saved_summary = f"**Saved Scores:** {saved_scores_display}"
                 if current_notes:
-                    st.markdown(f"**Saved Notes:** {current_notes}")
+                    saved_summary += f"\n\n**Saved Notes:** {current_notes}"
+                st.markdown(saved_summary)
             
             with source_col:
                 st.subheader("📄 Source Text PolicyTesting")
 
-                if df_reference_input is not None and len(df_reference_input) > 0:
+                if reference_inputs:
                     raw_text = original_reference_text
                     
                     highlight_style = 'background-color: #981ca3; font-weight: bold; color: white; padding: 2px; border-radius: 2px;' 
@@ -562,35 +815,31 @@ if not df.empty:
                     if "..." in raw_text:
                         # Split by "..." and filter out empty segments
                         segments = [seg.strip() for seg in raw_text.split("...") if seg.strip()]
+                        segments_lower = [seg.lower() for seg in segments]
                         
-                        for csv_input in df_reference_input['input'].tolist():
-                            csv_lower = csv_input.lower()
-                            # Check if ALL segments are found in the CSV input
-                            all_found = all(seg.lower() in csv_lower for seg in segments)
-                            if all_found:
+                        # Check if ALL segments are found in the CSV input (lowercase forms are cached per CSV)
+                        for csv_input, csv_lower in zip(reference_inputs, reference_inputs_lower):
+                            if all(seg in csv_lower for seg in segments_lower):
                                 best_csv_match = csv_input
                                 matched_segments = segments
                                 break
                     else:
                         # Original simple matching for complete text
-                        for csv_input in df_reference_input['input'].tolist():
-                            if raw_text.lower() in csv_input.lower():
+                        raw_lower = raw_text.lower()
+                        for csv_input, csv_lower in zip(reference_inputs, reference_inputs_lower):
+                            if raw_lower in csv_lower:
                                 best_csv_match = csv_input
                                 matched_segments = [raw_text]
                                 break
                     
                     if best_csv_match:
-                        final = best_csv_match
-                        # Highlight each matched segment
-                        for segment in matched_segments:
-                            # Find the segment case-insensitively but preserve original case
-                            import re
-                            pattern = re.compile(re.escape(segment), re.IGNORECASE)
-                            match = pattern.search(final)
-                            if match:
-                                original_text = match.group()
-                                styled_segment = f"<span style='{highlight_style}'>{original_text}</span>"
-                                final = final[:match.start()] + styled_segment + final[match.end():]
+                        # Highlight all matched segments in one pass, preserving original case
+                        ordered = sorted(matched_segments, key=len, reverse=True)
+                        pattern = re.compile("|".join(re.escape(seg) for seg in ordered), re.IGNORECASE)
+                        final = pattern.sub(
+                            lambda m: f"<span style='{highlight_style}'>{m.group(0)}</span>",
+                            best_csv_match
+                        )
                         
                         st.markdown("**CSV Input (Source Document)**")
                         st.markdown(final, unsafe_allow_html=True)
@@ -611,128 +860,15 @@ if not df.empty:
         st.markdown("---")
         st.subheader("✍️ Evaluation Scores")
         
-        # 2x2 Grid for 4 scoring matrices
-        score_row1_col1, score_row1_col2 = st.columns(2)
-        score_row2_col1, score_row2_col2 = st.columns(2)
-        
-        # 1. Semantic Fidelity (SF)
-        with score_row1_col1:
-            st.markdown("##### 🎯 Semantic Fidelity (SF)")
-            with st.expander("📖 Criteria Guide", expanded=False):
-                st.markdown("""
-**5 - Excellent:** The causal statement completely and accurately captures the meaning from the source text with no distortion or loss.
-
-**4 - Good:** The causal statement captures the meaning well, but may have minor phrasing differences that don't change the core meaning.
-
-**3 - Moderate:** The causal statement generally captures the meaning, but some nuance is lost or slightly altered.
-
-**2 - Below Average:** The causal statement captures some meaning, but has notable distortions or missing elements.
-
-**1 - Poor:** The causal statement significantly misrepresents or fails to capture the meaning from the source.
-""")
-            semantic_score = st.radio(
-                "Rate Semantic Fidelity (1-5):",
-                options=["—", "1", "2", "3", "4", "5"],
-                horizontal=True,
-                key=f"semantic_{selected_unique_id}",
-                index=["—", "1", "2", "3", "4", "5"].index(current_scores['semantic_fidelity']) if current_scores['semantic_fidelity'] in ["1", "2", "3", "4", "5"] else 0
-            )
-        
-        # 2. Schema Classification Accuracy (SA)
-        with score_row1_col2:
-            st.markdown("##### 📊 Schema Classification Accuracy (SA)")
-            with st.expander("📖 Criteria Guide", expanded=False):
-                st.markdown("""
-**5 - Excellent:** Causal Type, Sentence Type, and Marked Type are all correctly classified.
-
-**4 - Good:** Two out of three types are correctly classified; the third has a minor error.
-
-**3 - Moderate:** One major type (e.g., Causal Type) is incorrect, or two types have minor errors.
-
-**2 - Below Average:** Multiple types are incorrectly classified.
-
-**1 - Poor:** All or nearly all type classifications are incorrect.
-""")
-            schema_score = st.radio(
-                "Rate Schema Accuracy (1-5):",
-                options=["—", "1", "2", "3", "4", "5"],
-                horizontal=True,
-                key=f"schema_{selected_unique_id}",
-                index=["—", "1", "2", "3", "4", "5"].index(current_scores['schema_accuracy']) if current_scores['schema_accuracy'] in ["1", "2", "3", "4", "5"] else 0
-            )
-        
-        # 3. Explicit Type Accuracy (EA)
-        with score_row2_col1:
-            st.markdown("##### 🔍 Explicit Type Accuracy (EA)")
-            with st.expander("📖 Criteria Guide", expanded=False):
-                st.markdown("""
-**5 - Excellent:** Explicit Type classification is correct, matching the presence of a clear causal marker (e.g., "because," "therefore").
-
-**4 - Good:** Classification is correct, but the marker choice or reasoning is slightly ambiguous.
-
-**3 - Moderate:** Classification is borderline correct, with room for interpretation (e.g., implicit causality misidentified as explicit).
-
-**2 - Below Average:** Classification is incorrect but understandable given context.
-
-**1 - Poor:** Classification is clearly wrong (e.g., explicit marked as implicit or vice versa).
-""")
-            explicit_score = st.radio(
-                "Rate Explicit Type Accuracy (1-5):",
-                options=["—", "1", "2", "3", "4", "5"],
-                horizontal=True,
-                key=f"explicit_{selected_unique_id}",
-                index=["—", "1", "2", "3", "4", "5"].index(current_scores['explicit_accuracy']) if current_scores['explicit_accuracy'] in ["1", "2", "3", "4", "5"] else 0
-            )
-        
-        # 4. Structural Integrity (SI)
-        with score_row2_col2:
-            st.markdown("##### 🔗 Structural Integrity (SI)")
-            with st.expander("📖 Criteria Guide", expanded=False):
-                st.markdown("""
-**5 - Excellent:** Subject and Object are correctly identified with appropriate cause-to-effect directionality.
-
-**4 - Good:** Subject and Object are mostly correct; minor boundary or phrasing issues.
-
-**3 - Moderate:** One element (Subject or Object) is incorrect or direction is partially off.
-
-**2 - Below Average:** Significant errors in structure (e.g., roles swapped or incomplete).
-
-**1 - Poor:** Subject/Object are entirely wrong, or cause-effect directionality is reversed.
-""")
-            structural_score = st.radio(
-                "Rate Structural Integrity (1-5):",
-                options=["—", "1", "2", "3", "4", "5"],
-                horizontal=True,
-                key=f"structural_{selected_unique_id}",
-                index=["—", "1", "2", "3", "4", "5"].index(current_scores['structural_integrity']) if current_scores['structural_integrity'] in ["1", "2", "3", "4", "5"] else 0
-            )
-        
-        # Notes
-        notes = st.text_area("📝 Notes (optional):", value=current_notes, height=80, key=f"notes_{selected_unique_id}")
-        
-        # Save button
-        if st.button("💾 Save Score & Notes", type="primary", key=f"save_{selected_unique_id}"):
-            all_scores = load_scores()
-            
-            if selected_file_name not in all_scores:
-                all_scores[selected_file_name] = {}
-            
-            all_scores[selected_file_name][selected_unique_id] = {
-                "semantic_fidelity": semantic_score if semantic_score != "—" else "",
-                "schema_accuracy": schema_score if schema_score != "—" else "",
-                "explicit_accuracy": explicit_score if explicit_score != "—" else "",
-                "structural_integrity": structural_score if structural_score != "—" else "",
-                "notes": notes
-            }
-            
-            save_scores(all_scores)
-            st.success(f"Saved scores for Unique_ID: {selected_unique_id}")
-            
-            # Auto-select next row
-            current_idx = selected_row_data['original_index']
-            if current_idx < len(df_filtered) - 1:
-                st.session_state.auto_select_index = current_idx + 1
-                st.rerun()
+        criteria_guides()
+        score_form(
+            selected_file_name,
+            selected_unique_id,
+            int(selected_row_data['original_index']),
+            len(df_filtered),
+            (current_sf, current_sa, current_ea, current_si),
+            current_notes
+        )
 
     else:
         st.info("Select a row above to view details.")
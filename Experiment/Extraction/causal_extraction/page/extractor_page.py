@@ -1,10 +1,14 @@
 import streamlit as st
 import sys
 import os
+import atexit
+import csv
 import json
-import re
-import pandas as pd
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+
 # Try to import the project's GeminiClient
 try:
     from Experiment.Extraction.causal_extraction.utils.gemini import GeminiClient
@@ -25,6 +29,8 @@ except Exception:
     API_KEY = None
     out_as_json = None
 
+from Experiment.Extraction.causal_extraction.utils import fast_json, prompt_parsing
+
 # --- Constants - Using script-relative paths (works from anywhere) ---
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)  # Goes from engine/ to Causal_extractor/
@@ -32,13 +38,23 @@ PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)  # Goes from engine/ to Causal_extrac
 OUTPUT_DIR = os.path.join(PROJECT_ROOT, "data_extract", "output")
 LOG_FILE = os.path.join(PROJECT_ROOT, "data_extract", "generation_log.csv")
 
-# Load default prompt template with fallback
+# Default prompt template (loaded lazily, see load_default_prompt)
 DEFAULT_PROMPT_FILE = os.path.join(PROJECT_ROOT, "data_extract", "prompt", "causal_extract", "v4.txt")
-try:
-    with open(DEFAULT_PROMPT_FILE, 'r') as f:
-        default_prompt_template = f.read()
-except FileNotFoundError:
-    default_prompt_template = "Generate a JSON object based on the following input:\n{input}"
+FALLBACK_PROMPT_TEMPLATE = "Generate a JSON object based on the following input:\n{input}"
+
+# Number of streamed response chunks between redraws of the live preview
+STREAM_UPDATE_EVERY = 8
+
+# Writes output files so the disk write overlaps with rendering the result
+_OUTPUT_WRITER = ThreadPoolExecutor(max_workers=2)
+
+# Log rows are buffered and appended in batches (see append_to_log)
+LOG_COLUMNS = ["prompt_template", "input", "output_filename", "timestamp"]
+LOG_FLUSH_ROWS = 32
+LOG_FLUSH_SECONDS = 30.0
+_LOG_BUF = []
+_LOG_LOCK = threading.Lock()
+_LAST_FLUSH = [time.monotonic()]
 
 # --- Initialize Gemini ---
 @st.cache_resource
@@ -52,21 +68,88 @@ def get_gemini_client():
         return None
 
 # --- Helper Functions ---
+@st.cache_resource
+def load_default_prompt(path, mtime):
+    """Read the default prompt template once per file version, with fallback"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+    except FileNotFoundError:
+        return FALLBACK_PROMPT_TEMPLATE
+
+def _parse_model_json(raw):
+    """Parses a model response, falling back to span extraction and comment/trailing-comma cleanup.
+
+    Raises json.JSONDecodeError if the cleaned candidate still does not parse.
+    """
+    try:
+        return fast_json.loads(raw)
+    except Exception:
+        pass
+    candidate = prompt_parsing.extract_json_span(raw)
+    if "//" in candidate or "/*" in candidate:
+        candidate = prompt_parsing.COMMENT_RE.sub('', candidate)
+    if ',' in candidate:
+        candidate = prompt_parsing.TRAILING_COMMA_RE.sub(r'\1', candidate)
+    try:
+        return fast_json.loads(candidate)
+    except Exception:
+        raise json.JSONDecodeError("Failed to decode JSON", candidate, 0)
+
+def _write_output(filepath, parsed_json):
+    """Writes compact UTF-8 JSON; st.json handles pretty-printing for display. Runs on _OUTPUT_WRITER."""
+    with open(filepath, 'wb') as f:
+        f.write(fast_json.dumps(parsed_json))
+
 def initialize_log_file():
     """Creates the log file with headers if it doesn't exist."""
     if not os.path.exists(LOG_FILE):
-        df = pd.DataFrame(columns=["prompt_template", "input", "output_filename", "timestamp"])
-        df.to_csv(LOG_FILE, index=False)
+        with open(LOG_FILE, 'w', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerow(LOG_COLUMNS)
+
+def _flush_log_locked():
+    """Writes buffered log rows in one append. Caller must hold _LOG_LOCK."""
+    if _LOG_BUF:
+        with open(LOG_FILE, 'a', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerows(_LOG_BUF)
+        _LOG_BUF.clear()
+    _LAST_FLUSH[0] = time.monotonic()
+
+def flush_log():
+    """Writes any buffered log rows to the CSV log file."""
+    with _LOG_LOCK:
+        _flush_log_locked()
 
 def append_to_log(template, user_input, filename):
-    """Appends a new record to the CSV log file."""
-    new_log_entry = pd.DataFrame([{
-        "prompt_template": template,
-        "input": user_input,
-        "output_filename": filename,
-        "timestamp": datetime.now().isoformat()
-    }])
-    new_log_entry.to_csv(LOG_FILE, mode='a', header=False, index=False)
+    """Buffers a new record; flushed every LOG_FLUSH_ROWS rows or LOG_FLUSH_SECONDS."""
+    with _LOG_LOCK:
+        _LOG_BUF.append([template, user_input, filename, datetime.now().isoformat()])
+        if len(_LOG_BUF) >= LOG_FLUSH_ROWS or time.monotonic() - _LAST_FLUSH[0] > LOG_FLUSH_SECONDS:
+            _flush_log_locked()
+
+atexit.register(flush_log)
+
+@st.cache_data(show_spinner=False)
+def load_log_tail(path, mtime, size, n=10):
+    """Returns the last `n` log records. Cached on the file's mtime and size so reruns skip the parse."""
+    # Records span multiple lines (prompt templates), so parse the whole file
+    # rather than seeking to a byte offset that may land inside a quoted field.
+    # pandas is only needed here, so keep it off the app's import path.
+    import pandas as pd
+    return pd.read_csv(path).tail(n)
+
+def get_log_history(n=10):
+    """Last `n` log records: the cached file tail plus rows still waiting in _LOG_BUF (no flush)."""
+    import pandas as pd
+    with _LOG_LOCK:
+        pending = list(_LOG_BUF)
+    if os.path.exists(LOG_FILE):
+        log_tail = load_log_tail(LOG_FILE, os.path.getmtime(LOG_FILE), os.path.getsize(LOG_FILE), n)
+    else:
+        log_tail = pd.DataFrame(columns=LOG_COLUMNS)
+    if pending:
+        log_tail = pd.concat([log_tail, pd.DataFrame(pending, columns=LOG_COLUMNS)], ignore_index=True).tail(n)
+    return log_tail
 
 def show_extractor():
     """Main extractor page with two-column layout"""
@@ -75,11 +158,10 @@ def show_extractor():
     os.makedirs(OUTPUT_DIR, exist_ok=True)
     initialize_log_file()
     
-    # Get Gemini client
-    model = get_gemini_client()
-    if not model:
-        st.error("🚨 Could not initialize Gemini. Please check your API_KEY in config.py")
-        return
+    default_prompt_template = load_default_prompt(
+        DEFAULT_PROMPT_FILE,
+        os.path.getmtime(DEFAULT_PROMPT_FILE) if os.path.exists(DEFAULT_PROMPT_FILE) else 0
+    )
     
     # --- Main Content Layout: Two Columns (Matching Low-Fidelity Prototype) ---
     left_col, right_col = st.columns([1, 2], gap="large")
@@ -161,88 +243,67 @@ def show_extractor():
             st.rerun()
     
     # ============ BOTTOM SECTION: GENERATION RESULTS ============
-    st.divider()
-    
-    # --- Generation Logic ---
+    # --- Generation Logic (the client is only needed once the form is submitted) ---
     if form_submitted:
+        st.divider()
         prompt_template_val = prompt_template
         user_input_val = user_input
+        model = get_gemini_client()
         
-        if not prompt_template_val or not user_input_val:
+        if not model:
+            st.error("🚨 Could not initialize Gemini. Please check your API_KEY in config.py")
+        elif not prompt_template_val or not user_input_val:
             st.warning("⚠️ Please provide both a prompt template and an input value.")
         else:
             with st.spinner("🧠 Gemini is thinking..."):
                 try:
                     # Substitute user input into template
-                    if '{}' in prompt_template_val:
-                        final_prompt = prompt_template_val.replace('{}', str(user_input_val))
-                    elif '{input}' in prompt_template_val:
-                        final_prompt = prompt_template_val.replace('{input}', str(user_input_val))
-                    else:
-                        m = re.search(r"\{([A-Za-z0-9_]+)\}", prompt_template_val)
-                        if m:
-                            placeholder = m.group(0)
-                            final_prompt = prompt_template_val.replace(placeholder, str(user_input_val), 1)
-                        else:
-                            final_prompt = prompt_template_val + "\n\nInput: " + str(user_input_val)
+                    final_prompt = str(user_input_val).join(prompt_parsing.compile_template(prompt_template_val))
 
-                    # --- Call Gemini API ---
-                    text, response = model.generate(
+                    # --- Call Gemini API (streamed) ---
+                    # UploadedFile is already an in-memory BytesIO; GeminiClient
+                    # takes the buffer via getvalue(), so no per-file read/copy.
+                    stream_placeholder = st.empty()
+                    chunks = []
+                    for chunk in model.generate_stream(
                         prompt=final_prompt,
                         generation_config=out_as_json,
-                        pdf_bytes=[f.read() for f in uploaded_files] if uploaded_files else None,
+                        pdf_bytes=list(uploaded_files) if uploaded_files else None,
                         model_name="gemini-2.5-flash",
                         google_search=False
-                    )
-
-                    print(response)
+                    ):
+                        chunks.append(chunk)
+                        # Redraw every few chunks rather than on each one
+                        if len(chunks) % STREAM_UPDATE_EVERY == 0:
+                            stream_placeholder.code("".join(chunks), language="json")
+                    stream_placeholder.empty()
                     
                     # Clean the response
-                    raw = (text or "").strip()
-                    raw = raw.replace("```json", "").replace("```", "").strip()
-
-                    parsed_json = None
-                    try:
-                        parsed_json = json.loads(raw)
-                    except Exception:
-                        start = raw.find('[')
-                        end = raw.rfind(']')
-                        if start != -1 and end != -1 and end > start:
-                            candidate = raw[start:end+1]
-                        else:
-                            start = raw.find('{')
-                            end = raw.rfind('}')
-                            if start != -1 and end != -1 and end > start:
-                                candidate = raw[start:end+1]
-                            else:
-                                candidate = raw
+                    raw = "".join(chunks).strip()
+                    raw = prompt_parsing.strip_fences(raw)
 
-                        candidate_no_comments = re.sub(r'//.*(?=\n)|/\*.*?\*/', '', candidate, flags=re.S)
-                        candidate_no_comments = re.sub(r',\s*([}\]])', r'\1', candidate_no_comments)
-
-                        try:
-                            parsed_json = json.loads(candidate_no_comments)
-                        except Exception:
-                            raise json.JSONDecodeError("Failed to decode JSON", candidate_no_comments, 0)
+                    parsed_json = _parse_model_json(raw)
                     
-                    # Save output
+                    # Save output on the writer thread while the result renders
                     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                     filename = f"response_{timestamp}.json"
                     filepath = os.path.join(OUTPUT_DIR, filename)
-
-                    with open(filepath, 'w') as f:
-                        json.dump(parsed_json, f, indent=4)
-                    
-                    # Log and display
-                    append_to_log(prompt_template_val, user_input_val, filename)
-                    st.success(f"✅ Success! Response saved to: `{filepath}`")
+                    status_placeholder = st.empty()
+                    write_future = _OUTPUT_WRITER.submit(_write_output, filepath, parsed_json)
                     
                     st.subheader("📊 Generated Output")
                     st.json(parsed_json)
+                    
+                    # Log once the file is on disk. Flush right away: generation_log.csv is the
+                    # visualize page's default reference CSV, so the new input must be readable there
+                    write_future.result()
+                    append_to_log(prompt_template_val, user_input_val, filename)
+                    flush_log()
+                    status_placeholder.success(f"✅ Success! Response saved to: `{filepath}`")
 
                 except json.JSONDecodeError:
                     st.error("🚨 Failed to decode JSON from Gemini's response.")
-                    st.code(response.text, language="text")
+                    st.code(raw, language="text")
                 except Exception as e:
                     st.error(f"❌ An unexpected error occurred: {e}")
     
@@ -250,11 +311,8 @@ def show_extractor():
     st.divider()
     st.subheader("📜 Generation History")
     
-    if os.path.exists(LOG_FILE):
-        log_df = pd.read_csv(LOG_FILE)
-        if len(log_df) > 0:
-            st.dataframe(log_df.tail(10), use_container_width=True)
-        else:
-            st.info("No logs found yet. Generate a response to start logging.")
+    log_tail = get_log_history()
+    if len(log_tail) > 0:
+        st.dataframe(log_tail, use_container_width=True)
     else:
         st.info("No logs found yet. Generate a response to start logging.")
@@ -4,6 +4,8 @@ import json
 import os
 import re
 
+from Experiment.Extraction.causal_extraction.utils import score_log
+
 # Get the script's directory to build absolute paths
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(os.path.dirname(SCRIPT_DIR))  # Go up to Framework_Simulation_Garbage
@@ -13,9 +15,11 @@ BASE_DIR = os.path.join(PROJECT_ROOT, "Causal_extractor", "data_extract", "outpu
 REFERENCE_DIR = os.path.join(PROJECT_ROOT, "Causal_extractor", "data_extract")
 FOLLOWUP_FILE_PATH = os.path.join(PROJECT_ROOT, "Causal_extractor", "lib", "experiment_2_output.json")
 
-# --- NEW: Define the score storage path (inside the base directory) ---
-SCORE_FILE_NAME = "validation_scores.json"
+# --- NEW: Define the score storage path (JSONL log shared with the evaluation page, see utils/score_log.py) ---
+SCORE_FILE_NAME = score_log.SCORE_LOG_NAME
 SCORE_FILE_PATH = os.path.join(BASE_DIR, SCORE_FILE_NAME)
+LEGACY_SCORE_FILE_NAME = score_log.LEGACY_SCORE_FILE_NAME
+LEGACY_SCORE_FILE_PATH = os.path.join(BASE_DIR, LEGACY_SCORE_FILE_NAME)
 
 # Define column names based on your JSON structure (Main Data)
 # V4 schema columns (all fields from JSON)
@@ -55,22 +59,20 @@ REF_COL_NAME = "Source Text"  # V4 uses source_text
 # ------------------------------------------------------------------
 
 def load_scores():
-    """Loads the validation scores and notes from a JSON file."""
-    if not os.path.exists(SCORE_FILE_PATH):
-        return {}
+    """Loads the validation scores and notes by replaying the JSONL log."""
     try:
-        with open(SCORE_FILE_PATH, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        score_log.migrate_legacy_scores(SCORE_FILE_PATH, LEGACY_SCORE_FILE_PATH)
+        return score_log.read_score_log(SCORE_FILE_PATH)
     except Exception as e:
         st.error(f"Error loading scores: {e}")
         return {}
 
 def save_scores(scores):
-    """Saves the current validation scores and notes to a JSON file."""
+    """Appends the current validation scores and notes to the JSONL log (one record per file)."""
     try:
-        os.makedirs(os.path.dirname(SCORE_FILE_PATH), exist_ok=True)
-        with open(SCORE_FILE_PATH, 'w', encoding='utf-8') as f:
-            json.dump(scores, f, indent=4, ensure_ascii=False)
+        score_log.append_score_lines(SCORE_FILE_PATH, [
+            score_log.score_log_line(file_name, file_scores) for file_name, file_scores in scores.items()
+        ])
         st.toast("✅ Saved successfully!", icon='💾')
     except Exception as e:
         st.error(f"Error saving: {e}")
@@ -302,7 +304,7 @@ if reference_inputs:
 
 json_files = []
 if os.path.isdir(BASE_DIR):
-    json_files = [f for f in os.listdir(BASE_DIR) if f.endswith('.json') and f != SCORE_FILE_NAME]
+    json_files = [f for f in os.listdir(BASE_DIR) if f.endswith('.json') and f != LEGACY_SCORE_FILE_NAME]
 
 selected_file_name = None
 df = pd.DataFrame(columns=list(DISPLAY_COLUMNS_V4.values()) + ["Score", "Notes"])
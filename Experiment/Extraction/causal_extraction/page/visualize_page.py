@@ -1,8 +1,15 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
-import json
+import functools
 import os
 import re
+import types
+from dataclasses import dataclass, replace
+
+from Experiment.Extraction.causal_extraction.utils import fast_json
+from Experiment.Extraction.causal_extraction.utils.file_listing import list_files_with_ext
+from Experiment.Extraction.causal_extraction.utils.reference_index import build_reference_index
 
 # Get the script's directory to build absolute paths
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -17,11 +24,7 @@ FOLLOWUP_FILE_PATH = os.path.join(PROJECT_ROOT, "lib", "experiment_2_output.json
 SCORE_FILE_NAME = "validation_scores_saved.json"
 SCORE_FILE_PATH = os.path.join(BASE_DIR, SCORE_FILE_NAME)
 
-# Define column names based on JSON structure
-COLUMNS_V4 = [
-    "pattern_type", "sentence_type", "marked_type", "explicit_type",
-    "relationship", "marker", "subject", "object", "source_text", "reasoning"
-]
+# Define column names based on JSON structure (JSON key -> display name)
 DISPLAY_COLUMNS_V4 = {
     "pattern_type": "Pattern Type",
     "sentence_type": "Sentence Type",
@@ -36,7 +39,6 @@ DISPLAY_COLUMNS_V4 = {
 }
 
 # Legacy V3 schema columns
-COLUMNS_V3 = ["pattern", "causal type", "causal", "note", "Named entity/Object in causal", "original reference"]
 DISPLAY_COLUMNS_V3 = {
     "pattern": "Pattern",
     "causal type": "Causal Type",
@@ -46,20 +48,113 @@ DISPLAY_COLUMNS_V3 = {
     "original reference": "Original Reference"
 }
 
+# Low-cardinality type columns stored as category so filtering compares codes
+CATEGORY_COLUMNS = (
+    DISPLAY_COLUMNS_V4["pattern_type"],
+    DISPLAY_COLUMNS_V4["sentence_type"],
+    DISPLAY_COLUMNS_V4["marked_type"],
+    DISPLAY_COLUMNS_V4["explicit_type"],
+    DISPLAY_COLUMNS_V3["pattern"],
+    DISPLAY_COLUMNS_V3["causal type"]
+)
+
+# Score store field -> table column
+SCORE_COLUMNS = {
+    "sf": "SF",
+    "sa": "SA",
+    "ea": "EA",
+    "si": "SI",
+    "notes": "Notes"
+}
+
+@dataclass(frozen=True)
+class SchemaBundle:
+    """Schema-dependent column names used by the filters, selection table and detail view."""
+    pattern_col: str
+    causal_type_col: str
+    cols_for_selection: tuple
+    # (detail field, display column) pairs; column is None when the schema lacks it. A tuple rather
+    # than a dict keeps the frozen bundle immutable and picklable for st.cache_data.
+    detail_field_map: tuple
+
+SCHEMA_BUNDLES = {
+    "v4": SchemaBundle(
+        pattern_col=DISPLAY_COLUMNS_V4['pattern_type'],
+        causal_type_col=DISPLAY_COLUMNS_V4['sentence_type'],
+        cols_for_selection=(
+            'Unique_ID',
+            DISPLAY_COLUMNS_V4['pattern_type'],
+            DISPLAY_COLUMNS_V4['sentence_type'],
+            DISPLAY_COLUMNS_V4['marked_type'],
+            DISPLAY_COLUMNS_V4['explicit_type'],
+            DISPLAY_COLUMNS_V4['relationship'],
+            'SF', 'SA', 'EA', 'SI',
+            DISPLAY_COLUMNS_V4['source_text']
+        ),
+        detail_field_map=(
+            ("causal_statement", DISPLAY_COLUMNS_V4['relationship']),
+            ("reference", DISPLAY_COLUMNS_V4['source_text']),
+            ("pattern_type", DISPLAY_COLUMNS_V4['pattern_type']),
+            ("sentence_type", DISPLAY_COLUMNS_V4['sentence_type']),
+            ("marked_type", DISPLAY_COLUMNS_V4['marked_type']),
+            ("explicit_type", DISPLAY_COLUMNS_V4['explicit_type']),
+            ("marker", DISPLAY_COLUMNS_V4['marker']),
+            ("reasoning", DISPLAY_COLUMNS_V4['reasoning']),
+            ("subject", DISPLAY_COLUMNS_V4['subject']),
+            ("object", DISPLAY_COLUMNS_V4['object']),
+        )
+    ),
+    "v3": SchemaBundle(
+        pattern_col=DISPLAY_COLUMNS_V3['pattern'],
+        causal_type_col=DISPLAY_COLUMNS_V3['causal type'],
+        cols_for_selection=(
+            'Unique_ID',
+            DISPLAY_COLUMNS_V3['pattern'],
+            DISPLAY_COLUMNS_V3['causal type'],
+            DISPLAY_COLUMNS_V3['causal'],
+            'SF', 'SA', 'EA', 'SI',
+            DISPLAY_COLUMNS_V3['original reference']
+        ),
+        detail_field_map=(
+            ("causal_statement", DISPLAY_COLUMNS_V3['causal']),
+            ("reference", DISPLAY_COLUMNS_V3['original reference']),
+            ("pattern_type", DISPLAY_COLUMNS_V3['pattern']),
+            ("sentence_type", DISPLAY_COLUMNS_V3['causal type']),
+            ("marked_type", None),
+            ("explicit_type", None),
+            ("marker", None),
+            ("reasoning", DISPLAY_COLUMNS_V3['note']),
+            ("subject", None),
+            ("object", DISPLAY_COLUMNS_V3['Named entity/Object in causal']),
+        )
+    )
+}
+
+# Rows per chunk when streaming JSONL extractor outputs
+JSONL_CHUNK_ROWS = 4096
+
 # Default to V4 for display references
 REF_COL_NAME = "Source Text"
 
+# Columns of the empty placeholder table shown before a JSON file is selected
+EMPTY_VIEW_COLUMNS = (*DISPLAY_COLUMNS_V4.values(), "SF", "SA", "EA", "SI", "Notes")
+
 # ------------------------------------------------------------------
 # Helper Functions
 # ------------------------------------------------------------------
 
 def load_scores():
     """Loads the validation scores and notes from a JSON file."""
+    return _load_scores_cached(get_scores_file_mtime())
+
+@st.cache_data(show_spinner=False)
+def _load_scores_cached(scores_mtime):
+    """Parses the scores file once per file version (keyed on its mtime)."""
     if not os.path.exists(SCORE_FILE_PATH):
         return {}
     try:
-        with open(SCORE_FILE_PATH, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        with open(SCORE_FILE_PATH, 'rb') as f:
+            return fast_json.loads(f.read())
     except Exception as e:
         st.error(f"Error loading scores: {e}")
         return {}
@@ -68,31 +163,34 @@ def save_scores(scores):
     """Saves the current validation scores and notes to a JSON file."""
     try:
         os.makedirs(os.path.dirname(SCORE_FILE_PATH), exist_ok=True)
-        with open(SCORE_FILE_PATH, 'w', encoding='utf-8') as f:
-            json.dump(scores, f, indent=4, ensure_ascii=False)
+        with open(SCORE_FILE_PATH, 'wb') as f:
+            f.write(fast_json.dumps(scores, pretty=True))
         st.toast("✅ Saved successfully!", icon='💾')
     except Exception as e:
         st.error(f"Error saving: {e}")
 
-@st.cache_data
+@st.cache_resource
 def load_followup_questions():
-    """Load follow-up questions keyed by relationship_extraction."""
+    """Load follow-up questions keyed by relationship_extraction.
+
+    Cached as a shared resource (no copy/hash per access), so the mapping is returned read-only.
+    """
     if not os.path.exists(FOLLOWUP_FILE_PATH):
-        return {}
+        return types.MappingProxyType({})
     try:
-        with open(FOLLOWUP_FILE_PATH, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        with open(FOLLOWUP_FILE_PATH, 'rb') as f:
+            data = fast_json.loads(f.read())
         mapping = {}
         if isinstance(data, list):
             for item in data:
                 rel = item.get("relationship_extraction")
                 questions = item.get("generated_questions", [])
                 if rel and isinstance(questions, list):
-                    mapping[rel] = questions
-        return mapping
+                    mapping[rel] = tuple(questions)
+        return types.MappingProxyType(mapping)
     except Exception as e:
         st.error(f"Error loading follow-up questions: {e}")
-        return {}
+        return types.MappingProxyType({})
 
 def get_score_and_notes(all_scores, file_name, unique_id):
     """Get scores and notes for a specific row. Handles old format and new 4-matrix format."""
@@ -130,62 +228,83 @@ def get_scores_file_mtime():
         return os.path.getmtime(SCORE_FILE_PATH)
     return 0
 
+@st.cache_data(show_spinner=False)
+def load_output_json(file_path, file_mtime):
+    """Parse an extractor output file. Cached per file version so score saves don't re-parse it."""
+    with open(file_path, 'rb') as f:
+        return fast_json.loads(f.read())
+
+@st.cache_data(show_spinner=False)
+def load_output_jsonl(file_path, file_mtime):
+    """Stream a JSONL extractor output into a DataFrame chunk by chunk instead of decoding one big blob."""
+    reader = pd.read_json(file_path, lines=True, chunksize=JSONL_CHUNK_ROWS, dtype=False, convert_dates=False)
+    with reader:
+        chunks = list(reader)
+    if not chunks:
+        return pd.DataFrame()
+    return pd.concat(chunks, ignore_index=True)
+
 @st.cache_data
-def load_json_data(file_path, selected_file_name, scores_mtime):
-    """Load JSON data and merge with saved scores. Cache is invalidated when scores file changes."""
-    with open(file_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+def load_json_data(file_path, selected_file_name, scores_mtime, file_mtime=0):
+    """Load JSON (or JSONL) data and merge with saved scores. Cache is invalidated when the JSON or scores file changes.
+
+    Returns (df, schema_version, SchemaBundle) with the bundle's selection columns narrowed to those present.
+    """
+    if file_path.endswith('.jsonl'):
+        df = load_output_jsonl(file_path, file_mtime)
+        first_keys = df.columns if len(df) > 0 else None
+    else:
+        data = load_output_json(file_path, file_mtime)
+        df = pd.DataFrame(data)
+        first_keys = data[0] if isinstance(data, list) and len(data) > 0 else None
     
     # Auto-detect schema version
-    if isinstance(data, list) and len(data) > 0:
-        first_item = data[0]
-        if "pattern_type" in first_item or "sentence_type" in first_item:
-            schema_version = "v4"
-            columns = COLUMNS_V4
-            display_columns = DISPLAY_COLUMNS_V4
-        else:
-            schema_version = "v3"
-            columns = COLUMNS_V3
-            display_columns = DISPLAY_COLUMNS_V3
+    if first_keys is not None and "pattern_type" not in first_keys and "sentence_type" not in first_keys:
+        schema_version = "v3"
+        display_columns = DISPLAY_COLUMNS_V3
     else:
         schema_version = "v4"
-        columns = COLUMNS_V4
         display_columns = DISPLAY_COLUMNS_V4
+    bundle = SCHEMA_BUNDLES[schema_version]
     
-    df = pd.DataFrame(data)
-    
-    # Rename columns for display
-    rename_map = {col: display_columns.get(col, col) for col in df.columns if col in display_columns}
-    df = df.rename(columns=rename_map)
+    # Rename columns for display (keys missing from the JSON are ignored)
+    df = df.rename(columns=display_columns)
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            try:
+                df[col] = df[col].astype('category')
+            except TypeError:
+                # list/dict cells from malformed rows are unhashable; keep the column as object
+                pass
     
     # Create unique ID
     df['Unique_ID'] = df.index.astype(str)
     
-    # Load existing scores
+    # Load existing scores (cached on the scores file mtime)
     all_scores = load_scores()
     
-    # Add score and notes columns
-    sf_list, sa_list, ea_list, si_list, notes_list = [], [], [], [], []
-    for idx, row in df.iterrows():
-        unique_id = str(idx)
-        sf, sa, ea, si, notes = get_score_and_notes(all_scores, selected_file_name, unique_id)
-        sf_list.append(sf)
-        sa_list.append(sa)
-        ea_list.append(ea)
-        si_list.append(si)
-        notes_list.append(notes)
+    # Add score and notes columns with one dict lookup per row
+    file_scores = all_scores.get(selected_file_name, {})
+    entries = [file_scores.get(uid, {}) for uid in df['Unique_ID'].to_numpy()]
+    for field, column in SCORE_COLUMNS.items():
+        df[column] = [entry.get(field, '') for entry in entries]
     
-    df['SF'] = sf_list
-    df['SA'] = sa_list
-    df['EA'] = ea_list
-    df['SI'] = si_list
-    df['Notes'] = notes_list
-    
-    return df, schema_version
+    bundle = replace(bundle, cols_for_selection=tuple(c for c in bundle.cols_for_selection if c in df.columns))
+    return df, schema_version, bundle
+
+@st.cache_data(ttl=2)
+def list_json_outputs(base_dir, dir_mtime):
+    """List output JSON/JSONL files newest-first. Cached on the directory mtime."""
+    with os.scandir(base_dir) as it:
+        entries = [(e.name, e.stat().st_mtime) for e in it
+                   if e.is_file() and e.name.endswith(('.json', '.jsonl'))
+                   and e.name != SCORE_FILE_NAME]
+    entries.sort(key=lambda x: x[1], reverse=True)
+    return [name for name, _ in entries]
 
 @st.cache_data
-def load_csv_reference(csv_path):
-    """Load the reference CSV file."""
+def load_csv_reference(csv_path, csv_mtime):
+    """Load the reference CSV file. Cached on the file mtime so an edited CSV is re-read."""
     try:
         df_csv = pd.read_csv(csv_path)
         if 'input' in df_csv.columns:
@@ -197,13 +316,26 @@ def load_csv_reference(csv_path):
         st.error(f"Error reading CSV: {e}")
         return pd.DataFrame(columns=['input'])
 
-def highlight_references(row, selected_reference_input):
-    style = [''] * len(row)
-    if selected_reference_input and selected_reference_input != 'None':
-        original_reference_text = str(row[REF_COL_NAME]).strip()
-        if original_reference_text == selected_reference_input.strip():
-            style = ['background-color: #ffd700; color: #333333'] * len(row)
-    return style
+@st.cache_data
+def prepare_reference_index(csv_path, csv_mtime):
+    """Reference inputs plus their lowercased forms as tuples, built once per CSV version and shared
+    by the reference selectbox and source matching."""
+    return build_reference_index(load_csv_reference(csv_path, csv_mtime)['input'].tolist())
+
+@functools.lru_cache(maxsize=1024)
+def segments_pattern(segments):
+    """Case-insensitive alternation over source segments (longest first), compiled once per tuple."""
+    ordered = sorted(segments, key=len, reverse=True)
+    return re.compile("|".join(re.escape(seg) for seg in ordered), re.IGNORECASE)
+
+def reference_match_mask(df, selected_reference_input):
+    """Boolean array of rows whose reference text equals the selected input, computed in one pass."""
+    if not selected_reference_input or selected_reference_input == 'None' or REF_COL_NAME not in df.columns:
+        return np.zeros(len(df), dtype=bool)
+    return (df[REF_COL_NAME].astype(str).str.strip() == selected_reference_input.strip()).to_numpy()
+
+def highlight_references(col, match_mask):
+    return np.where(match_mask, 'background-color: #ffd700; color: #333333', '')
 
 # ------------------------------------------------------------------
 # Main Visualize Function
@@ -222,12 +354,11 @@ def show_visualize():
     csv_files = []
     if os.path.isdir(REFERENCE_DIR):
         try:
-            csv_files = [f for f in os.listdir(REFERENCE_DIR) if f.endswith('.csv')]
+            csv_files = list_files_with_ext(REFERENCE_DIR, '.csv', os.stat(REFERENCE_DIR).st_mtime)
         except OSError as e:
             st.sidebar.error(f"Permission: {e}")
 
     selected_csv_file_name = None
-    df_reference_input = pd.DataFrame(columns=['input'])
 
     if csv_files:
         default = csv_files.index("generation_log.csv") if "generation_log.csv" in csv_files else 0
@@ -237,18 +368,20 @@ def show_visualize():
             index=default,
         )
         
+        reference_inputs, reference_inputs_lower = (), ()
         if selected_csv_file_name:
             csv_ref_path = os.path.join(REFERENCE_DIR, selected_csv_file_name)
-            df_reference_input = load_csv_reference(csv_ref_path)
-        reference_inputs = df_reference_input['input'].tolist()
+            reference_inputs, reference_inputs_lower = prepare_reference_index(
+                csv_ref_path, os.path.getmtime(csv_ref_path)
+            )
     else:
         st.sidebar.warning("No CSV found.")
-        reference_inputs = []
+        reference_inputs, reference_inputs_lower = (), ()
 
     selected_reference_input = 'None'
 
     if reference_inputs:
-        display_options = ['None'] + reference_inputs
+        display_options = ('None', *reference_inputs)
         selected_reference_input = st.sidebar.selectbox(
             "Match Original Reference:",
             display_options,
@@ -261,18 +394,24 @@ def show_visualize():
 
     json_files = []
     if os.path.isdir(BASE_DIR):
-        json_files = [f for f in os.listdir(BASE_DIR) if f.endswith('.json') and f != SCORE_FILE_NAME]
+        json_files = list_json_outputs(BASE_DIR, os.path.getmtime(BASE_DIR))
 
     selected_file_name = None
-    df = pd.DataFrame(columns=list(DISPLAY_COLUMNS_V4.values()) + ["SF", "SA", "EA", "SI", "Notes"])
+    df = pd.DataFrame(columns=list(EMPTY_VIEW_COLUMNS))
     schema_version = "v4"
+    bundle = SCHEMA_BUNDLES[schema_version]
 
     if json_files:
         selected_file_name = st.selectbox("Select JSON", options=json_files)
         
         if selected_file_name:
             full_path = os.path.join(BASE_DIR, selected_file_name)
-            df, schema_version = load_json_data(full_path, selected_file_name, scores_mtime=get_scores_file_mtime())
+            df, schema_version, bundle = load_json_data(
+                full_path,
+                selected_file_name,
+                scores_mtime=get_scores_file_mtime(),
+                file_mtime=os.path.getmtime(full_path)
+            )
             st.caption(f"Detected schema: **{schema_version.upper()}**")
     else:
         st.info("No JSON files found.")
@@ -282,13 +421,9 @@ def show_visualize():
     # ----------------------------------------------------
 
     if not df.empty:
-        # Determine column names based on detected schema
-        if schema_version == "v4":
-            pattern_col = DISPLAY_COLUMNS_V4['pattern_type']
-            causal_type_col = DISPLAY_COLUMNS_V4['sentence_type']
-        else:
-            pattern_col = DISPLAY_COLUMNS_V3['pattern']
-            causal_type_col = DISPLAY_COLUMNS_V3['causal type']
+        # Column names for the detected schema (resolved inside the cached loader)
+        pattern_col = bundle.pattern_col
+        causal_type_col = bundle.causal_type_col
 
         col1, col2 = st.columns(2)
 
@@ -296,8 +431,8 @@ def show_visualize():
             if pattern_col in df.columns:
                 selected_patterns = st.multiselect(
                     f"Filter by {pattern_col}:",
-                    df[pattern_col].unique(),
-                    default=df[pattern_col].unique()
+                    df[pattern_col].unique().tolist(),
+                    default=df[pattern_col].unique().tolist()
                 )
             else:
                 selected_patterns = []
@@ -306,27 +441,25 @@ def show_visualize():
             if causal_type_col in df.columns:
                 selected_causal_types = st.multiselect(
                     f"Filter by {causal_type_col}:",
-                    df[causal_type_col].unique(),
-                    default=df[causal_type_col].unique()
+                    df[causal_type_col].unique().tolist(),
+                    default=df[causal_type_col].unique().tolist()
                 )
             else:
                 selected_causal_types = []
 
-        # Apply filters
-        df_filtered = df.copy()
+        # Apply filters as one combined mask and a single slice
+        mask = np.ones(len(df), dtype=bool)
         if pattern_col in df.columns and selected_patterns:
-            df_filtered = df_filtered[df_filtered[pattern_col].isin(selected_patterns)]
+            mask &= df[pattern_col].isin(selected_patterns).to_numpy()
         if causal_type_col in df.columns and selected_causal_types:
-            df_filtered = df_filtered[df_filtered[causal_type_col].isin(selected_causal_types)]
-        df_filtered = df_filtered.reset_index(drop=True)
+            mask &= df[causal_type_col].isin(selected_causal_types).to_numpy()
+        df_filtered = df.loc[mask].reset_index(drop=True)
         
         st.subheader(f"Filtered Data ({len(df_filtered)} rows)")
 
         if selected_reference_input != 'None':
-            styled_df = df_filtered.style.apply(
-                lambda row: highlight_references(row, selected_reference_input),
-                axis=1
-            )
+            match_mask = reference_match_mask(df_filtered, selected_reference_input)
+            styled_df = df_filtered.style.apply(highlight_references, axis=0, match_mask=match_mask)
             st.dataframe(styled_df, use_container_width=True)
         else:
             st.dataframe(df_filtered, use_container_width=True, hide_index=True)
@@ -338,31 +471,11 @@ def show_visualize():
         # ----------------------------------------------------
         st.header("Causal Statement Detail View")
 
-        # Build detail view columns based on schema
-        if schema_version == "v4":
-            cols_for_selection = [
-                'Unique_ID',
-                DISPLAY_COLUMNS_V4['pattern_type'],
-                DISPLAY_COLUMNS_V4['sentence_type'],
-                DISPLAY_COLUMNS_V4['marked_type'],
-                DISPLAY_COLUMNS_V4['explicit_type'],
-                DISPLAY_COLUMNS_V4['relationship'],
-                'SF', 'SA', 'EA', 'SI',
-                DISPLAY_COLUMNS_V4['source_text']
-            ]
-        else:
-            cols_for_selection = [
-                'Unique_ID',
-                DISPLAY_COLUMNS_V3['pattern'],
-                DISPLAY_COLUMNS_V3['causal type'],
-                DISPLAY_COLUMNS_V3['causal'],
-                'SF', 'SA', 'EA', 'SI',
-                DISPLAY_COLUMNS_V3['original reference']
-            ]
-        cols_for_selection = [c for c in cols_for_selection if c in df_filtered.columns]
-        
-        df_selection_view = df_filtered[cols_for_selection].copy()
-        df_selection_view.insert(0, 'Select', False)
+        # Categorical columns would render as selectboxes limited to their existing
+        # categories in the editor, so it gets plain object columns
+        df_selection_view = df_filtered[list(bundle.cols_for_selection)].astype(
+            {col: object for col in CATEGORY_COLUMNS if col in bundle.cols_for_selection}
+        )
         
         # Initialize current_selected_index in session state
         if 'current_selected_index' not in st.session_state:
@@ -373,11 +486,13 @@ def show_visualize():
             st.session_state.current_selected_index = st.session_state.auto_select_index
             st.session_state.auto_select_index = None
         
-        # Apply the current selection from session state
+        # Build the Select column with the current selection from session state
+        select_col = np.zeros(len(df_selection_view), dtype=bool)
         if st.session_state.current_selected_index is not None:
             idx = st.session_state.current_selected_index
             if idx < len(df_selection_view):
-                df_selection_view.loc[idx, 'Select'] = True
+                select_col[idx] = True
+        df_selection_view.insert(0, 'Select', select_col)
         
         edited_df_view = st.data_editor(
             df_selection_view.drop(columns=['Unique_ID']), 
@@ -392,13 +507,13 @@ def show_visualize():
             key="detail_view_editor"
         )
 
-        edited_df_with_id = pd.merge(
-            edited_df_view.reset_index(names=['original_index']),
-            df_filtered[['Unique_ID']].reset_index(names=['original_index']),
-            on='original_index',
-        )
-        
-        selected_rows = edited_df_with_id[edited_df_with_id['Select'] == True]
+        # The editor rows keep df_filtered's positions (index was reset above),
+        # so selected positions map straight back to their Unique_IDs
+        selected_positions = np.flatnonzero((edited_df_view['Select'] == True).to_numpy())
+        selected_rows = pd.DataFrame({
+            'original_index': selected_positions,
+            'Unique_ID': df_filtered['Unique_ID'].to_numpy()[selected_positions],
+        })
         
         # Update session state based on user selection
         if len(selected_rows) == 1:
@@ -422,32 +537,23 @@ def show_visualize():
                 selected_row_data = selected_rows.iloc[0]
                 selected_unique_id = str(selected_row_data['Unique_ID'])
 
-                # Get full row data
-                unique_id = selected_row_data['Unique_ID']
-                full_row = df_filtered[df_filtered['Unique_ID'] == unique_id].iloc[0]
+                # Get full row data (original_index is the row's position in df_filtered)
+                full_row = df_filtered.iloc[selected_row_data['original_index']]
                 
-                if schema_version == "v4":
-                    causal_statement = full_row.get(DISPLAY_COLUMNS_V4['relationship'], '')
-                    original_reference_text = str(full_row.get(DISPLAY_COLUMNS_V4['source_text'], '')).strip()
-                    pattern_type = full_row.get(DISPLAY_COLUMNS_V4['pattern_type'], '')
-                    sentence_type = full_row.get(DISPLAY_COLUMNS_V4['sentence_type'], '')
-                    marked_type = full_row.get(DISPLAY_COLUMNS_V4['marked_type'], '')
-                    explicit_type = full_row.get(DISPLAY_COLUMNS_V4['explicit_type'], '')
-                    marker = full_row.get(DISPLAY_COLUMNS_V4['marker'], '')
-                    reasoning = full_row.get(DISPLAY_COLUMNS_V4['reasoning'], '')
-                    subject = full_row.get(DISPLAY_COLUMNS_V4['subject'], '')
-                    obj = full_row.get(DISPLAY_COLUMNS_V4['object'], '')
-                else:
-                    causal_statement = full_row.get(DISPLAY_COLUMNS_V3['causal'], '')
-                    original_reference_text = str(full_row.get(DISPLAY_COLUMNS_V3['original reference'], '')).strip()
-                    pattern_type = full_row.get(DISPLAY_COLUMNS_V3['pattern'], '')
-                    sentence_type = full_row.get(DISPLAY_COLUMNS_V3['causal type'], '')
-                    marked_type = ''
-                    explicit_type = ''
-                    marker = ''
-                    subject = ''
-                    obj = full_row.get(DISPLAY_COLUMNS_V3['Named entity/Object in causal'], '')
-                    reasoning = full_row.get(DISPLAY_COLUMNS_V3['note'], '')
+                detail = {
+                    field: full_row.get(col, '') if col else ''
+                    for field, col in bundle.detail_field_map
+                }
+                causal_statement = detail["causal_statement"]
+                original_reference_text = str(detail["reference"]).strip()
+                pattern_type = detail["pattern_type"]
+                sentence_type = detail["sentence_type"]
+                marked_type = detail["marked_type"]
+                explicit_type = detail["explicit_type"]
+                marker = detail["marker"]
+                reasoning = detail["reasoning"]
+                subject = detail["subject"]
+                obj = detail["object"]
                 
                 # Side-by-side layout
                 details_col, source_col = st.columns(2)
@@ -473,13 +579,14 @@ def show_visualize():
                     
                     st.subheader("📝 Selected Item Details")
                     
-                    # Full Relationship
-                    st.markdown("##### 🔗 Full Relationship")
-                    st.markdown(f"<p style='font-size:20px; line-height:1.6;'><em>{causal_statement}</em></p>", unsafe_allow_html=True)
-                    
-                    # Subject and Object
-                    st.markdown(f"<p style='font-size:18px;'><strong>{DISPLAY_COLUMNS_V4['subject']}:</strong> <span style='color:#28a745; font-size:20px;'>{subject or '—'}</span></p>", unsafe_allow_html=True)
-                    st.markdown(f"<p style='font-size:18px;'><strong>{DISPLAY_COLUMNS_V4['object']}:</strong> <span style='color:#dc3545; font-size:20px;'>{obj or '—'}</span></p>", unsafe_allow_html=True)
+                    # Full Relationship and Subject/Object in one markdown call
+                    html_parts = [
+                        "##### 🔗 Full Relationship",
+                        f"<p style='font-size:20px; line-height:1.6;'><em>{causal_statement}</em></p>",
+                        f"<p style='font-size:18px;'><strong>{DISPLAY_COLUMNS_V4['subject']}:</strong> <span style='color:#28a745; font-size:20px;'>{subject or '—'}</span></p>",
+                        f"<p style='font-size:18px;'><strong>{DISPLAY_COLUMNS_V4['object']}:</strong> <span style='color:#dc3545; font-size:20px;'>{obj or '—'}</span></p>",
+                    ]
+                    st.markdown("\n\n".join(html_parts), unsafe_allow_html=True)
                     
                     # Classification Types
                     st.markdown("##### 📋 Classification Types")
@@ -506,39 +613,38 @@ def show_visualize():
                 with source_col:
                     st.subheader("📄 Source Text PolicyTesting")
 
-                    if df_reference_input is not None and len(df_reference_input) > 0:
+                    if reference_inputs:
                         raw_text = original_reference_text
                         
                         highlight_style = 'background-color: #981ca3; font-weight: bold; color: white; padding: 2px; border-radius: 2px;' 
                         best_csv_match = None
                         matched_segments = []
                         
+                        # Match against the cached lowercase index of the CSV inputs
                         if "..." in raw_text:
                             segments = [seg.strip() for seg in raw_text.split("...") if seg.strip()]
+                            segments_lower = [seg.lower() for seg in segments]
                             
-                            for csv_input in df_reference_input['input'].tolist():
-                                csv_lower = csv_input.lower()
-                                all_found = all(seg.lower() in csv_lower for seg in segments)
-                                if all_found:
+                            for csv_input, csv_lower in zip(reference_inputs, reference_inputs_lower):
+                                if all(seg in csv_lower for seg in segments_lower):
                                     best_csv_match = csv_input
                                     matched_segments = segments
                                     break
                         else:
-                            for csv_input in df_reference_input['input'].tolist():
-                                if raw_text.lower() in csv_input.lower():
+                            raw_lower = raw_text.lower()
+                            for csv_input, csv_lower in zip(reference_inputs, reference_inputs_lower):
+                                if raw_lower in csv_lower:
                                     best_csv_match = csv_input
                                     matched_segments = [raw_text]
                                     break
                         
                         if best_csv_match:
-                            final = best_csv_match
-                            for segment in matched_segments:
-                                pattern = re.compile(re.escape(segment), re.IGNORECASE)
-                                match = pattern.search(final)
-                                if match:
-                                    original_text = match.group()
-                                    styled_segment = f"<span style='{highlight_style}'>{original_text}</span>"
-                                    final = final[:match.start()] + styled_segment + final[match.end():]
+                            # One pass over the text for all segments, keeping the source's casing
+                            pattern = segments_pattern(tuple(matched_segments))
+                            final = pattern.sub(
+                                lambda m: f"<span style='{highlight_style}'>{m.group(0)}</span>",
+                                best_csv_match
+                            )
                             
                             st.markdown("**CSV Input (Source Document)**")
                             st.markdown(final, unsafe_allow_html=True)
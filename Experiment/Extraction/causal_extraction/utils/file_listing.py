@@ -0,0 +1,11 @@
+"""Directory listings shared by the streamlit pages, cached on the directory mtime."""
+import os
+
+import streamlit as st
+
+
+@st.cache_data(show_spinner=False)
+def list_files_with_ext(dirpath, ext, dir_mtime):
+    """Names of regular files in dirpath ending with ext. Adding or removing an entry bumps `dir_mtime`."""
+    with os.scandir(dirpath) as it:
+        return tuple(e.name for e in it if e.is_file(follow_symlinks=False) and e.name.endswith(ext))
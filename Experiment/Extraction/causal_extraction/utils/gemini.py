@@ -46,27 +46,9 @@ class GeminiClient:
             print("generation_config must be an instance of GenerationConfig")
             return None    
         try:
-            contents = list(
-                [
-                    Part.from_text(text=prompt),
-                ],
+            contents = self._build_contents(
+                prompt, generation_config, pdf_bytes, image_bytes, image_mime_type, google_search
             )
-            if google_search:
-                generation_config.tools = [Tool(google_search=GoogleSearch())]
-            if pdf_bytes:
-                for pdf_byte in pdf_bytes:
-                    contents.append(
-                        Part.from_bytes(
-                            data=pdf_byte.getvalue(), mime_type="application/pdf"
-                        )
-                    )
-            if image_bytes:
-                for image_byte in image_bytes:
-                    contents.append(
-                        Part.from_bytes(
-                            data=image_byte.getvalue(), mime_type=image_mime_type
-                        )
-                    )
             response = self.client.models.generate_content(
                 model=model_name, contents=contents, config=generation_config
             )
@@ -80,6 +62,55 @@ class GeminiClient:
             print(error_msg)
             return "", None
 
+    def generate_stream(
+            self,
+            prompt: str,
+            generation_config: GenerateContentConfig,
+            model_name: str = "gemini-2.5-flash-preview-04-17",
+            pdf_bytes: list[io.BytesIO] | None = None,
+            image_bytes: list[io.BytesIO] | None = None,
+            image_mime_type: str = "application/json",
+            google_search=True,
+                    ):
+        """Yields response text chunks as they arrive. API errors propagate to the caller."""
+        if not isinstance(generation_config, GenerateContentConfig):
+            print("generation_config must be an instance of GenerationConfig")
+            return
+        contents = self._build_contents(
+            prompt, generation_config, pdf_bytes, image_bytes, image_mime_type, google_search
+        )
+        for chunk in self.client.models.generate_content_stream(
+            model=model_name, contents=contents, config=generation_config
+        ):
+            if chunk.text:
+                yield chunk.text
+
+    def _build_contents(
+            self, prompt, generation_config, pdf_bytes, image_bytes, image_mime_type, google_search
+                    ) -> list[Part]:
+        contents = list(
+            [
+                Part.from_text(text=prompt),
+            ],
+        )
+        if google_search:
+            generation_config.tools = [Tool(google_search=GoogleSearch())]
+        if pdf_bytes:
+            for pdf_byte in pdf_bytes:
+                contents.append(
+                    Part.from_bytes(
+                        data=pdf_byte.getvalue(), mime_type="application/pdf"
+                    )
+                )
+        if image_bytes:
+            for image_byte in image_bytes:
+                contents.append(
+                    Part.from_bytes(
+                        data=image_byte.getvalue(), mime_type=image_mime_type
+                    )
+                )
+        return contents
+
     def set_cost(self, inp_cost: float, out_cost: float):
         self.cost_per_million_input = inp_cost
         self.cost_per_million_output = out_cost
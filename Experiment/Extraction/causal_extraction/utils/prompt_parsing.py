@@ -0,0 +1,93 @@
+"""Prompt-template substitution and model-response cleanup shared by the extractor pages."""
+import functools
+import re
+
+PLACEHOLDER_RE = re.compile(r"\{([A-Za-z0-9_]+)\}")
+COMMENT_RE = re.compile(r'//.*(?=\n)|/\*.*?\*/', re.S)
+TRAILING_COMMA_RE = re.compile(r',\s*([}\]])')
+
+
+@functools.lru_cache(maxsize=64)
+def resolve_placeholder(template):
+    """Returns `(token, count)` for substituting input into `template`.
+
+    Strategies used in order:
+    1) Replace literal `{}`
+    2) Replace `{input}` specifically
+    3) Replace the first simple `{word}` placeholder
+    4) Fallback: `(None, 0)`, the input is appended to the end of the prompt
+    """
+    if '{}' in template:
+        return '{}', -1
+    if '{input}' in template:
+        return '{input}', -1
+    m = PLACEHOLDER_RE.search(template)
+    if m:
+        return m.group(0), 1
+    return None, 0
+
+
+@functools.lru_cache(maxsize=128)
+def compile_template(template):
+    """Splits `template` around its placeholder so substitution is a single join.
+
+    Returns the literal segments between placeholder occurrences; the prompt is
+    `str(user_input).join(segments)`. Without a placeholder the input is appended.
+    """
+    placeholder, count = resolve_placeholder(template)
+    if placeholder:
+        return tuple(template.split(placeholder, count))
+    return (template + "\n\nInput: ", "")
+
+
+def strip_fences(raw):
+    """Removes markdown code fences from a model response.
+
+    Fences normally wrap the whole response, so they are sliced off the ends;
+    the full-text replace only runs if a fence is still left inside.
+    """
+    if raw.startswith("```"):
+        raw = raw[7:] if raw.startswith("```json") else raw[3:]
+    if raw.endswith("```"):
+        raw = raw[:-3]
+    if "```" in raw:
+        raw = raw.replace("```json", "").replace("```", "")
+    return raw.strip()
+
+
+def extract_json_span(s):
+    """Returns the outermost balanced JSON array/object in `s`, found in a single pass.
+
+    Brackets inside string literals are skipped. If the value is never closed
+    (e.g. a truncated response) everything from the opening bracket is returned;
+    if there is no opening bracket `s` is returned unchanged.
+    """
+    n = len(s)
+    i = 0
+    while i < n and s[i] not in '[{':
+        i += 1
+    if i == n:
+        return s
+    open_ch = s[i]
+    close_ch = ']' if open_ch == '[' else '}'
+    depth = 0
+    in_str = False
+    esc = False
+    for j in range(i, n):
+        c = s[j]
+        if in_str:
+            if esc:
+                esc = False
+            elif c == '\\':
+                esc = True
+            elif c == '"':
+                in_str = False
+        elif c == '"':
+            in_str = True
+        elif c == open_ch:
+            depth += 1
+        elif c == close_ch:
+            depth -= 1
+            if depth == 0:
+                return s[i:j + 1]
+    return s[i:]
@@ -0,0 +1,7 @@
+"""Reference-input lookup tables shared by the visualization and evaluation pages."""
+
+
+def build_reference_index(inputs):
+    """Reference inputs as a tuple of str plus their lowercased forms, for case-insensitive source matching."""
+    inputs = tuple(str(text) for text in inputs)
+    return inputs, tuple(text.lower() for text in inputs)
@@ -0,0 +1,92 @@
+"""Append-only JSONL store for validation scores, shared by the evaluation and visualize pages.
+
+Each line is one `{file_name: {unique_id: entry, ...}}` record; replaying the lines in order
+(last write per row wins) gives the current scores.
+"""
+import os
+
+from Experiment.Extraction.causal_extraction.utils import fast_json
+
+SCORE_LOG_NAME = "validation_scores.jsonl"
+# Whole-file JSON store used before the JSONL log; migrated on first load
+LEGACY_SCORE_FILE_NAME = "validation_scores.json"
+
+
+def upgrade_score_entry(entry):
+    """Converts an old-format entry (bare score string or single "score" key) to the 4-matrix format.
+    Returns None when the entry is already in the new format."""
+    if isinstance(entry, str):
+        score, notes = entry, ""
+    elif "score" in entry and "semantic_fidelity" not in entry:
+        score, notes = entry.get("score", ""), entry.get("notes", "")
+    else:
+        return None
+    return {
+        "semantic_fidelity": score,
+        "schema_accuracy": "",
+        "explicit_accuracy": "",
+        "structural_integrity": "",
+        "notes": notes
+    }
+
+
+def migrate_legacy_entries(scores):
+    """Upgrades old-format entries in place. Returns True if anything changed."""
+    changed = False
+    for file_scores in scores.values():
+        for unique_id, entry in file_scores.items():
+            upgraded = upgrade_score_entry(entry)
+            if upgraded is not None:
+                file_scores[unique_id] = upgraded
+                changed = True
+    return changed
+
+
+def write_file_atomic(path, data):
+    """Writes bytes to a temp file next to path, then swaps it in so readers never see a partial file."""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def score_log_line(file_name, file_scores):
+    """One JSONL log record: {file_name: {unique_id: entry, ...}}."""
+    return fast_json.dumps({file_name: file_scores}) + b"\n"
+
+
+def migrate_legacy_scores(log_path, legacy_path):
+    """Converts the old whole-file JSON store (upgrading old-format entries) into the JSONL log.
+
+    Only runs while the log does not exist yet. Returns True if a migration was written.
+    """
+    if os.path.exists(log_path) or not os.path.exists(legacy_path):
+        return False
+    with open(legacy_path, 'rb') as f:
+        legacy_scores = fast_json.loads(f.read())
+    migrate_legacy_entries(legacy_scores)
+    write_file_atomic(log_path, b"".join(
+        score_log_line(file_name, file_scores) for file_name, file_scores in legacy_scores.items()
+    ))
+    return True
+
+
+def read_score_log(log_path):
+    """Replays the JSONL log into {file_name: {unique_id: entry}}; empty when the log does not exist."""
+    scores = {}
+    if not os.path.exists(log_path):
+        return scores
+    with open(log_path, 'rb') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            for file_name, file_scores in fast_json.loads(line).items():
+                scores.setdefault(file_name, {}).update(file_scores)
+    return scores
+
+
+def append_score_lines(log_path, lines):
+    """Appends encoded log lines to the JSONL log in one write."""
+    os.makedirs(os.path.dirname(log_path), exist_ok=True)
+    with open(log_path, 'ab') as f:
+        f.write(b"".join(lines))
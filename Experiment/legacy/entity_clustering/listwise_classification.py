@@ -1,4 +1,4 @@
-import json
+import functools
 import os
 import pandas as pd
 import csv
@@ -18,15 +18,24 @@ sys.path.append(project_root)
 
 from utils.prompt import out_as_json
 from utils.gemini import GeminiClient
+from utils import fast_json
 from config import API_KEY
-with open("prompt.json") as f:
-    prompts = json.load(f)
-prompt_template = prompts["listwise_clustering"]
-client = GeminiClient(key=API_KEY)
 path = "./output/exp1"
 dir_path = "./output/exp2/"
 
 
+@functools.lru_cache(maxsize=1)
+def _get_prompt_template():
+    # prompt.json is resolved from the working directory (causal extract folder), read once on first use
+    with open("prompt.json", "rb") as f:
+        return fast_json.loads(f.read())["listwise_clustering"]
+
+
+@functools.lru_cache(maxsize=1)
+def _get_client():
+    return GeminiClient(key=API_KEY)
+
+
 if __name__ == "__main__":
     path = input("target directory from root (causal extract folder): ")
     if path == "":
@@ -46,19 +55,17 @@ if __name__ == "__main__":
     raw_data = pd.read_json(selected_file)
     context_add = int(input("using context? (0/1): "))
     if context_add == 1:
-        named_entities = ""
-        # handle decompose comma seperate
-        for i, record in raw_data.iterrows():
-            named_entities+=f"context: {record[2]} named entity: {record[4]}\n"
+        # one "context: ... named entity: ..." line per record (3rd and 5th column)
+        parts = "context: " + raw_data.iloc[:,2].astype(str) + " named entity: " + raw_data.iloc[:,4].astype(str) + "\n"
+        named_entities = "".join(parts.tolist())
     else:
-        named_entities = []
-        for record in raw_data.iloc[:,-2].to_list():
-            for i in record.split(","):
-                clean = i.strip()
-                # drop duplicate 
-                if clean not in named_entities:
-                    named_entities.append(clean)
+        # decompose comma seperated entities, strip and drop duplicate (first occurrence order kept);
+        # records without entities are skipped, empty entities are kept like the old loop did
+        tokens = raw_data.iloc[:,-2].dropna().str.split(",").explode().str.strip()
+        named_entities = tokens.drop_duplicates().tolist()
     print("named entity cleaned:" ,named_entities)
+    prompt_template = _get_prompt_template()
+    client = _get_client()
     request = prompt_template.format(named_entities)
     print(f"request: {request}")
     try:
@@ -95,13 +102,12 @@ if __name__ == "__main__":
         f.write(str(response))
     # save log at nec_log.csv as header: output_path, input_path, prompt_template, inference time
     log_file_path = "output/nec_log.csv"
-    # check if the file exist if not we write header file
-    if not os.path.isfile(log_file_path):
-         with open(log_file_path, "w", newline='') as f:
-             writer = csv.writer(f)
-             writer.writerow(["method","output path", "input path", "prompt template", "inference time", "input tokens", "output tokens", "reasoning tokens"])
-    with open(log_file_path, "a+", newline='') as f:
+    # check if the file exist if not we write header file (same handle as the row)
+    need_header = not os.path.isfile(log_file_path)
+    with open(log_file_path, "a", newline='') as f:
              writer = csv.writer(f)
+             if need_header:
+                 writer.writerow(["method","output path", "input path", "prompt template", "inference time", "input tokens", "output tokens", "reasoning tokens"])
              writer.writerow([
                 "Listwise",
                 output_path,
@@ -117,6 +123,8 @@ if __name__ == "__main__":
 
 def manual_input():
     test = input("named entity list: ")
+    prompt_template = _get_prompt_template()
+    client = _get_client()
     request = prompt_template.format(test)
     print(f"request: {request}")
     output, response = client.generate(prompt_template.format(test), out_as_json, model_name = "gemini-2.5-pro", google_search=False)